@@ -0,0 +1,216 @@
+"""
+Complete distance tables for small MNPuzzle boards.
+
+Whether an MNPuzzle state is solvable, and in how many moves, depends
+only on the shape of the board, on which tile of to_grid is the blank
+and on the rank of the state (see MNPuzzle.rank).  build_distance_table
+runs one breadth-first search backwards from the solved state (rank 0)
+over every rank and writes the distance of each to a file;
+DistanceTable memory-maps such a file and answers any puzzle on that
+board with a shortest path by walking downhill through the table.
+
+File layout: magic b"MNDT", version (u16), n, m, blank and the largest
+distance (u8 each), then one byte per rank 0..(nm)! - 1 holding its
+distance, or UNREACHABLE.  That is 362880 bytes for 3x3 boards and
+479 MB for 3x4 boards.
+"""
+import mmap
+import struct
+from math import factorial
+import numpy as np
+from mn_puzzle import MNPuzzle, blank_moves
+from mn_puzzle_batch import expand_states
+from mn_puzzle_rank import neighbour_ranks
+from puzzle_tools import path_to_node
+
+MAGIC = b"MNDT"
+VERSION = 1
+UNREACHABLE = 0xFF
+_HEADER = struct.Struct("<4sHBBBB")
+
+
+def _rank_rows(states, size):
+    # Return the rank of the permutation in the first size columns of
+    # each row of states, as mn_puzzle.lehmer_rank does for one.
+    #
+    # @type states: numpy.ndarray
+    # @type size: int
+    # @rtype: numpy.ndarray
+    ranks = np.zeros(len(states), dtype=np.int64)
+    for i in range(size):
+        smaller = (states[:, i + 1:size] < states[:, i:i + 1]).sum(axis=1)
+        ranks = ranks * (size - i) + smaller
+    return ranks
+
+
+def _unrank_rows(ranks, size, blank):
+    # Return an array with a row per rank in ranks holding its
+    # permutation, as mn_puzzle.lehmer_unrank does for one, followed by
+    # the position of tile blank.
+    #
+    # @type ranks: numpy.ndarray
+    # @type size: int
+    # @type blank: int
+    # @rtype: numpy.ndarray
+    states = np.empty((len(ranks), size + 1), dtype=np.int64)
+    ranks = ranks.copy()
+    # the Lehmer code, last digit first
+    for i in range(size - 1, -1, -1):
+        ranks, states[:, i] = np.divmod(ranks, size - i)
+    # turn the code into the permutation: each entry counts the unused
+    # values below it
+    for i in range(size - 2, -1, -1):
+        states[:, i + 1:size] += states[:, i + 1:size] >= states[:, i:i + 1]
+    states[:, size] = (states[:, :size] == blank).argmax(axis=1)
+    return states
+
+
+def build_distance_table(to_grid, path, chunk=1 << 20):
+    """
+    Write to file path the distance table of the board of to_grid,
+    expanding at most chunk states at a time.
+
+    @type to_grid: tuple[tuple[str]]
+    @type path: str
+    @type chunk: int
+    @rtype: None
+    """
+    n, m = len(to_grid), len(to_grid[0])
+    size = n * m
+    assert size <= 12
+    blank = [s for row in to_grid for s in row].index("*")
+    moves = blank_moves(n, m)
+    table = np.full(factorial(size), UNREACHABLE, dtype=np.uint8)
+    table[0] = 0
+    frontier, depth = np.zeros(1, dtype=np.int64), 0
+    while len(frontier):
+        layer = []
+        for start in range(0, len(frontier), chunk):
+            states = _unrank_rows(frontier[start:start + chunk], size, blank)
+            children = _rank_rows(expand_states(states, moves, size,
+                                                blank)[0], size)
+            children = np.unique(children)
+            layer.append(children[table[children] == UNREACHABLE])
+        frontier = np.unique(np.concatenate(layer))
+        if len(frontier):
+            depth += 1
+            assert depth < UNREACHABLE
+            table[frontier] = depth
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, n, m, blank, depth))
+        table.tofile(f)
+
+
+class DistanceTable:
+    """
+    A memory-mapped distance table written by build_distance_table.
+    """
+
+    def __init__(self, path):
+        """
+        Create a new DistanceTable self from file path.
+
+        @type self: DistanceTable
+        @type path: str
+        @rtype: None
+        """
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0,
+                              access=mmap.ACCESS_READ)
+        magic, version, self.n, self.m, self.blank, self.max_distance = \
+            _HEADER.unpack_from(self._map, 0)
+        assert magic == MAGIC and version == VERSION
+        self._size = self.n * self.m
+        assert len(self._map) == _HEADER.size + factorial(self._size)
+        self._moves = blank_moves(self.n, self.m)
+
+    def close(self):
+        """
+        Release the file behind DistanceTable self.
+
+        @type self: DistanceTable
+        @rtype: None
+        """
+        self._map.close()
+        self._file.close()
+
+    def _check(self, puzzle):
+        # Assert that puzzle is on the board of DistanceTable self.
+        #
+        # @type puzzle: MNPuzzle
+        # @rtype: None
+        symbols = [s for row in puzzle.to_grid for s in row]
+        assert (puzzle.n, puzzle.m) == (self.n, self.m)
+        assert symbols.index("*") == self.blank
+
+    def distance(self, puzzle):
+        """
+        Return the number of moves in a shortest solution of puzzle, or
+        None if it has none.
+
+        @type self: DistanceTable
+        @type puzzle: MNPuzzle
+        @rtype: int | None
+        """
+        self._check(puzzle)
+        d = self._map[_HEADER.size + puzzle.rank()]
+        return None if d == UNREACHABLE else d
+
+    def solve(self, puzzle):
+        """
+        Return a shortest path from PuzzleNode(puzzle) to a PuzzleNode
+        containing a solution, or None if this is not possible.
+
+        @type self: DistanceTable
+        @type puzzle: MNPuzzle
+        @rtype: PuzzleNode | None
+
+        >>> import os, tempfile
+        >>> path = os.path.join(tempfile.mkdtemp(), "2x3.dist")
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> build_distance_table(target_grid, path, chunk=7)
+        >>> table = DistanceTable(path)
+        >>> table.max_distance
+        21
+        >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+        >>> sol = table.solve(MNPuzzle(start_grid, target_grid))
+        >>> moves = 0
+        >>> while sol.children:
+        ...     sol = sol.children[0]
+        ...     moves += 1
+        >>> moves, sol.puzzle.is_solved()
+        (3, True)
+        >>> stuck = MNPuzzle((("2", "1", "3"), ("4", "5", "*")), target_grid)
+        >>> table.distance(stuck), table.solve(stuck)
+        (None, None)
+        >>> table.close()
+        """
+        self._check(puzzle)
+        r = puzzle.rank()
+        d = self._map[_HEADER.size + r]
+        if d == UNREACHABLE:
+            return None
+        ranks = [r]
+        # some neighbour is always one move closer to the solution
+        for closer in range(d - 1, -1, -1):
+            r = [c for c in neighbour_ranks(r, self._size, self.blank,
+                                            self._moves)
+                 if self._map[_HEADER.size + c] == closer][0]
+            ranks.append(r)
+        return path_to_node([puzzle.from_rank(r) for r in ranks])
+
+
+if __name__ == "__main__":
+    import doctest
+    import sys
+    doctest.testmod()
+    from time import time
+    # usage: python mn_distance_table.py N M PATH
+    if len(sys.argv) == 4:
+        n, m = int(sys.argv[1]), int(sys.argv[2])
+        tiles = [str(i) for i in range(1, n * m)] + ["*"]
+        to_grid = tuple(tuple(tiles[i * m:(i + 1) * m]) for i in range(n))
+        start = time()
+        build_distance_table(to_grid, sys.argv[3])
+        print("built the {}x{} distance table in {} seconds".format(
+            n, m, time() - start))
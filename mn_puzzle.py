@@ -135,7 +135,7 @@ class MNPuzzle(Puzzle):
                         result += [new]
                     if i + 1 < len(self.from_grid):
                         new_from_rowi = list(self.from_grid[i])
-                        new_from_rowi1 = list(self.from_grid[i])
+                        new_from_rowi1 = list(self.from_grid[i + 1])
                         new_from_rowi[j] = new_from_rowi1[j]
                         new_from_rowi1[j] = "*"
                         new_rowi = tuple(new_from_rowi)
@@ -146,7 +146,7 @@ class MNPuzzle(Puzzle):
                         result += [new]
                     if i - 1 >= 0:
                         new_from_rowi = list(self.from_grid[i])
-                        new_from_rowi1 = list(self.from_grid[i])
+                        new_from_rowi1 = list(self.from_grid[i - 1])
                         new_from_rowi[j] = new_from_rowi1[j]
                         new_from_rowi1[j] = "*"
                         new_rowi = tuple(new_from_rowi)
@@ -181,6 +181,171 @@ class MNPuzzle(Puzzle):
         """
         return self.from_grid == self.to_grid
 
+    def heuristic(self):
+        """
+        Return the sum over all tiles other than "*" of their row and
+        column distances from their places in to_grid.
+
+        @type self: MNPuzzle
+        @rtype: int
+
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+        >>> MNPuzzle(start_grid, target_grid).heuristic()
+        3
+        """
+        target = {s: (i, j) for i, row in enumerate(self.to_grid)
+                  for j, s in enumerate(row)}
+        total = 0
+        for i, row in enumerate(self.from_grid):
+            for j, s in enumerate(row):
+                if s != "*":
+                    total += abs(target[s][0] - i) + abs(target[s][1] - j)
+        return total
+
+    def ordered_extensions(self):
+        """
+        Return the extensions of MNPuzzle self, lowest heuristic first.
+
+        @type self: MNPuzzle
+        @rtype: list[MNPuzzle]
+
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> start_grid = (("1", "2", "3"), ("4", "*", "5"))
+        >>> mn = MNPuzzle(start_grid, target_grid)
+        >>> mn.ordered_extensions()[0].is_solved()
+        True
+        """
+        return sorted(self.extensions(), key=lambda x: x.heuristic())
+
+    def state_key(self):
+        """
+        Return a bytes key for from_grid: one byte per cell, holding
+        the position in to_grid of the symbol in that cell.
+
+        @type self: MNPuzzle
+        @rtype: bytes
+
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+        >>> mn = MNPuzzle(start_grid, target_grid)
+        >>> list(mn.state_key())
+        [5, 1, 2, 0, 3, 4]
+        >>> mn.from_state_key(mn.state_key()) == mn
+        True
+        """
+        symbols = [s for row in self.to_grid for s in row]
+        return bytes([symbols.index(s)
+                      for row in self.from_grid for s in row])
+
+    def from_state_key(self, key):
+        """
+        Return the MNPuzzle with the same to_grid as self whose
+        state_key is key.
+
+        @type self: MNPuzzle
+        @type key: bytes
+        @rtype: MNPuzzle
+        """
+        symbols = [s for row in self.to_grid for s in row]
+        return MNPuzzle(tuple(tuple(symbols[t] for t in
+                                    key[i * self.m:(i + 1) * self.m])
+                              for i in range(self.n)), self.to_grid)
+
+    def rank(self):
+        """
+        Return the rank of from_grid among all arrangements of the
+        symbols of to_grid: the Lehmer code of state_key, a number in
+        0..(nm)! - 1 that is 0 exactly when self is solved.
+
+        @type self: MNPuzzle
+        @rtype: int
+
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+        >>> mn = MNPuzzle(start_grid, target_grid)
+        >>> mn.rank()
+        630
+        >>> mn.from_rank(630) == mn
+        True
+        >>> MNPuzzle(target_grid, target_grid).rank()
+        0
+        """
+        return lehmer_rank(self.state_key())
+
+    def from_rank(self, r):
+        """
+        Return the MNPuzzle with the same to_grid as self whose rank
+        is r.
+
+        @type self: MNPuzzle
+        @type r: int
+        @rtype: MNPuzzle
+        """
+        return self.from_state_key(bytes(lehmer_unrank(r, self.n * self.m)))
+
+
+def blank_moves(n, m):
+    """
+    Return, for each position p = i * m + j of an nxm board, the list of
+    positions the blank can move to from p: right, left, down and up,
+    where these are on the board.
+
+    @type n: int
+    @type m: int
+    @rtype: list[list[int]]
+
+    >>> blank_moves(2, 3)
+    [[1, 3], [2, 0, 4], [1, 5], [4, 0], [5, 3, 1], [4, 2]]
+    """
+    table = []
+    for p in range(n * m):
+        i, j = divmod(p, m)
+        table.append([q for q, ok in ((p + 1, j + 1 < m), (p - 1, j >= 1),
+                                      (p + m, i + 1 < n), (p - m, i >= 1))
+                      if ok])
+    return table
+
+
+def lehmer_rank(perm):
+    """
+    Return the rank of permutation perm of 0..len(perm) - 1 in
+    lexicographic order.
+
+    @type perm: Sequence[int]
+    @rtype: int
+
+    >>> [lehmer_rank(p) for p in ([0, 1, 2], [0, 2, 1], [2, 1, 0])]
+    [0, 1, 5]
+    """
+    r, size = 0, len(perm)
+    for i in range(size):
+        smaller = 0
+        for j in range(i + 1, size):
+            if perm[j] < perm[i]:
+                smaller += 1
+        r = r * (size - i) + smaller
+    return r
+
+
+def lehmer_unrank(r, size):
+    """
+    Return the permutation of 0..size - 1 with rank r.
+
+    @type r: int
+    @type size: int
+    @rtype: list[int]
+
+    >>> lehmer_unrank(5, 3)
+    [2, 1, 0]
+    """
+    digits = []
+    for base in range(1, size + 1):
+        r, digit = divmod(r, base)
+        digits.append(digit)
+    available = list(range(size))
+    return [available.pop(d) for d in reversed(digits)]
+
 if __name__ == "__main__":
     import doctest
     doctest.testmod()
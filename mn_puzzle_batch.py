@@ -0,0 +1,191 @@
+"""
+Batched breadth-first search for MNPuzzle.
+
+A whole BFS layer is held as one 2-D NumPy array: each row is a state,
+columns 0..nm-1 hold the tile at each position (tiles are numbered by
+their position in to_grid) and the last column holds the index of the
+blank.  Successors of the layer are generated with array operations and
+deduplicated on integer keys that pack 4 bits per position, so boards
+of up to 16 cells (3x3, 3x4, 4x4) are supported.
+"""
+import numpy as np
+from mn_puzzle import MNPuzzle, blank_moves
+from puzzle_tools import path_to_node
+
+# bits used for one tile in a packed key
+_BITS = 4
+
+
+def _pack(states, size):
+    """
+    Return a uint64 key for each row of states, using only the first
+    size columns.
+
+    @type states: numpy.ndarray
+    @type size: int
+    @rtype: numpy.ndarray
+    """
+    shifts = np.arange(size, dtype=np.uint64) * np.uint64(_BITS)
+    return np.bitwise_or.reduce(
+        states[:, :size].astype(np.uint64) << shifts, axis=1)
+
+
+def _unpack(key, size):
+    """
+    Return the list of tile numbers packed in key.
+
+    @type key: int
+    @type size: int
+    @rtype: list[int]
+
+    >>> _unpack(int(_pack(np.array([[2, 0, 1]]), 3)[0]), 3)
+    [2, 0, 1]
+    """
+    mask = (1 << _BITS) - 1
+    return [(int(key) >> (_BITS * p)) & mask for p in range(size)]
+
+
+def expand_states(frontier, moves, size, blank):
+    """
+    Return every successor of the states in frontier, and for each the
+    row of frontier it was generated from.  moves is the blank_moves
+    table of the board and blank the tile number of the blank.
+
+    @type frontier: numpy.ndarray
+    @type moves: list[list[int]]
+    @type size: int
+    @type blank: int
+    @rtype: (numpy.ndarray, numpy.ndarray)
+
+    >>> children, parents = expand_states(np.array([[1, 2, 0, 2]]),
+    ...                                   blank_moves(1, 3), 3, 0)
+    >>> children.tolist(), parents.tolist()
+    ([[1, 0, 2, 1]], [0])
+    """
+    # the moves from each position, padded with -1
+    table = np.full((size, 4), -1, dtype=np.int64)
+    for p, targets in enumerate(moves):
+        table[p, :len(targets)] = targets
+    blanks = frontier[:, size]
+    children, parents = [], []
+    for d in range(4):
+        targets = table[blanks, d]
+        rows = np.nonzero(targets >= 0)[0]
+        if len(rows) == 0:
+            continue
+        old_blank, new_blank = blanks[rows], targets[rows]
+        child = frontier[rows].copy()
+        index = np.arange(len(rows))
+        # the tile next to the blank slides into the blank's position
+        child[index, old_blank] = child[index, new_blank]
+        child[index, new_blank] = blank
+        child[:, size] = new_blank
+        children.append(child)
+        parents.append(rows)
+    if not children:
+        return (np.empty((0, size + 1), dtype=frontier.dtype),
+                np.empty(0, dtype=np.int64))
+    return np.concatenate(children), np.concatenate(parents)
+
+
+def batch_breadth_first_solve(puzzle):
+    """
+    Return a shortest path from PuzzleNode(puzzle) to a PuzzleNode
+    containing a solution, as breadth_first_solve does, or None if no
+    solution exists.
+
+    MNPuzzle objects are only created for the states on the path.
+
+    @type puzzle: MNPuzzle
+    @rtype: PuzzleNode | None
+
+    >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+    >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+    >>> sol = batch_breadth_first_solve(MNPuzzle(start_grid, target_grid))
+    >>> moves = 0
+    >>> while sol.children:
+    ...     sol = sol.children[0]
+    ...     moves += 1
+    >>> moves
+    3
+    >>> sol.puzzle.is_solved()
+    True
+    >>> stuck = MNPuzzle((("2", "1", "3"), ("4", "5", "*")), target_grid)
+    >>> batch_breadth_first_solve(stuck) is None
+    True
+    """
+    n, m = puzzle.n, puzzle.m
+    size = n * m
+    assert size <= 64 // _BITS
+    symbols = [s for row in puzzle.to_grid for s in row]
+    assert len(set(symbols)) == size and "*" in symbols
+    assert sorted(s for row in puzzle.from_grid for s in row) == \
+        sorted(symbols)
+    code = {s: i for i, s in enumerate(symbols)}
+    blank = code["*"]
+    moves = blank_moves(n, m)
+
+    start = [code[s] for row in puzzle.from_grid for s in row]
+    frontier = np.array([start + [start.index(blank)]], dtype=np.int64)
+    goal = int(_pack(np.array([list(range(size))]), size)[0])
+
+    # keys[d] is the sorted array of keys at depth d, parents[d][i] the
+    # index in keys[d - 1] of the state keys[d][i] was reached from
+    keys = [_pack(frontier, size)]
+    parents = [np.array([-1])]
+    while len(frontier):
+        hit = np.searchsorted(keys[-1], goal)
+        if hit < len(keys[-1]) and keys[-1][hit] == goal:
+            return path_to_node(_rebuild(puzzle, symbols, keys, parents,
+                                         int(hit)))
+        children, rows = expand_states(frontier, moves, size, blank)
+        child_keys = _pack(children, size)
+        # sliding-tile graphs are undirected, so a new state can only
+        # repeat one from the current or the previous layer
+        fresh = ~np.isin(child_keys, keys[-1])
+        if len(keys) > 1:
+            fresh &= ~np.isin(child_keys, keys[-2])
+        # np.unique sorts, so the rows of every layer stay in key order
+        # and a row of frontier is also its index in keys[-1]
+        child_keys, first = np.unique(child_keys[fresh], return_index=True)
+        parents.append(rows[fresh][first])
+        frontier = children[fresh][first]
+        keys.append(child_keys)
+    return None
+
+
+def _rebuild(puzzle, symbols, keys, parents, index):
+    """
+    Return the list of MNPuzzles from puzzle to the state stored at
+    keys[-1][index].
+
+    @type puzzle: MNPuzzle
+    @type symbols: list[str]
+    @type keys: list[numpy.ndarray]
+    @type parents: list[numpy.ndarray]
+    @type index: int
+    @rtype: list[MNPuzzle]
+    """
+    size = len(symbols)
+    path = []
+    for depth in range(len(keys) - 1, -1, -1):
+        tiles = [symbols[t] for t in _unpack(keys[depth][index], size)]
+        grid = tuple(tuple(tiles[i * puzzle.m:(i + 1) * puzzle.m])
+                     for i in range(puzzle.n))
+        path.append(MNPuzzle(grid, puzzle.to_grid))
+        index = int(parents[depth][index])
+    path.reverse()
+    return path
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
+    from time import time
+    target_grid = (("1", "2", "3"), ("4", "5", "6"), ("7", "8", "*"))
+    start_grid = (("8", "6", "7"), ("2", "5", "4"), ("3", "*", "1"))
+    start = time()
+    solution = batch_breadth_first_solve(MNPuzzle(start_grid, target_grid))
+    end = time()
+    print("Batched BFS solved: \n\n{} \n\nin {} seconds".format(
+        solution, end - start))
@@ -0,0 +1,157 @@
+"""
+Flat, rank-indexed state stores for MNPuzzle searches.
+
+Every MNPuzzle state on an nxm board has a rank in 0..(nm)! - 1 (see
+MNPuzzle.rank), so sets of states and their distances can live in
+preallocated bytearrays indexed by rank instead of in Python sets of
+tuples and PuzzleNodes.  Two bits per state, enough for the depths a
+breadth-first search walks back through, is 120 MB for a 3x4 board.
+"""
+from array import array
+from math import factorial
+from mn_puzzle import MNPuzzle, blank_moves, lehmer_rank, lehmer_unrank
+from puzzle_tools import path_to_node
+
+
+class RankDepths:
+    """
+    Breadth-first depths of ranks in 0..size - 1, stored modulo 3 in
+    two bits per rank.
+
+    In a graph where every move can be undone, the neighbours of a
+    state at depth d are at depths d - 1, d or d + 1, so depth modulo 3
+    is enough to step back towards the start of the search.
+    """
+
+    def __init__(self, size):
+        """
+        Create a new RankDepths self with no depth recorded for any
+        rank below size.
+
+        @type self: RankDepths
+        @type size: int
+        @rtype: None
+        """
+        self.size = size
+        self._bits = bytearray((size + 3) // 4)
+
+    def get(self, r):
+        """
+        Return the depth of rank r modulo 3, or None if none was set.
+
+        @type self: RankDepths
+        @type r: int
+        @rtype: int | None
+
+        >>> depths = RankDepths(720)
+        >>> depths.set(630, 7)
+        >>> depths.get(630), depths.get(631)
+        (1, None)
+        """
+        # 0 means unset, otherwise depth % 3 + 1
+        value = self._bits[r >> 2] >> ((r & 3) << 1) & 3
+        return None if value == 0 else value - 1
+
+    def set(self, r, depth):
+        """
+        Record depth as the depth of rank r.
+
+        @type self: RankDepths
+        @type r: int
+        @type depth: int
+        @rtype: None
+        """
+        shift = (r & 3) << 1
+        self._bits[r >> 2] = ((self._bits[r >> 2] & ~(3 << shift)) |
+                              (depth % 3 + 1) << shift)
+
+
+def neighbour_ranks(r, size, blank, moves):
+    """
+    Return the ranks of the states one move away from the state with
+    rank r, on a board of size cells whose blank has tile number blank
+    and whose blank moves are given by moves.
+
+    @type r: int
+    @type size: int
+    @type blank: int
+    @type moves: list[list[int]]
+    @rtype: list[int]
+
+    >>> sorted(neighbour_ranks(0, 6, 5, blank_moves(2, 3)))
+    [1, 21]
+    """
+    perm = lehmer_unrank(r, size)
+    p = perm.index(blank)
+    result = []
+    for q in moves[p]:
+        perm[p], perm[q] = perm[q], perm[p]
+        result.append(lehmer_rank(perm))
+        perm[p], perm[q] = perm[q], perm[p]
+    return result
+
+
+def ranked_breadth_first_solve(puzzle):
+    """
+    Return a shortest path from PuzzleNode(puzzle) to a PuzzleNode
+    containing a solution, or None if this is not possible.
+
+    States are handled as ranks: visited states and their depths live
+    in a RankDepths of (nm)! / 4 bytes and the current and next layers
+    in arrays of 8-byte ranks, and MNPuzzles are only built for the
+    path.
+
+    @type puzzle: MNPuzzle
+    @rtype: PuzzleNode | None
+
+    >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+    >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+    >>> sol = ranked_breadth_first_solve(MNPuzzle(start_grid, target_grid))
+    >>> moves = 0
+    >>> while sol.children:
+    ...     sol = sol.children[0]
+    ...     moves += 1
+    >>> moves
+    3
+    >>> stuck = MNPuzzle((("2", "1", "3"), ("4", "5", "*")), target_grid)
+    >>> ranked_breadth_first_solve(stuck) is None
+    True
+    """
+    size = puzzle.n * puzzle.m
+    symbols = [s for row in puzzle.to_grid for s in row]
+    blank, moves = symbols.index("*"), blank_moves(puzzle.n, puzzle.m)
+    depths = RankDepths(factorial(size))
+    start = puzzle.rank()
+    depths.set(start, 0)
+    frontier, depth = array("Q", [start]), 0
+    # the solved state has rank 0
+    while frontier and depths.get(0) is None:
+        layer = array("Q")
+        for r in frontier:
+            for child in neighbour_ranks(r, size, blank, moves):
+                if depths.get(child) is None:
+                    depths.set(child, depth + 1)
+                    layer.append(child)
+        frontier, depth = layer, depth + 1
+    if depths.get(0) is None:
+        return None
+    # walk back from the solution through states one layer shallower
+    path, r = [0], 0
+    for d in range(depth - 1, -1, -1):
+        r = [c for c in neighbour_ranks(r, size, blank, moves)
+             if depths.get(c) == d % 3][0]
+        path.append(r)
+    return path_to_node([puzzle.from_rank(r) for r in reversed(path)])
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
+    from time import time
+    target_grid = (("1", "2", "3"), ("4", "5", "6"), ("7", "8", "*"))
+    start_grid = (("8", "6", "7"), ("2", "5", "4"), ("3", "*", "1"))
+    start = time()
+    solution = ranked_breadth_first_solve(MNPuzzle(start_grid, target_grid))
+    end = time()
+    print("Ranked BFS solved: \n\n{} \n\nin {} seconds".format(
+        solution, end - start))
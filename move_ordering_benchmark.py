@@ -0,0 +1,120 @@
+"""
+Count the nodes depth-first searches expand with and without the move
+ordering of Puzzle.ordered_extensions.
+
+Sudokus and peg solitaire boards are solved with depth_first_solve;
+MNPuzzles and word ladders, whose move graphs have cycles, with
+iterative_deepening_solve.  A node is expanded each time a search asks
+a puzzle for its ordered extensions; without ordering the plain order
+of extensions is used instead.
+
+usage: python move_ordering_benchmark.py
+"""
+from time import time
+from puzzle_tools import depth_first_solve, iterative_deepening_solve
+from puzzle_io import parse_sudoku, parse_peg
+from mn_puzzle import MNPuzzle
+from word_ladder_puzzle import WordLadderPuzzle
+
+SUDOKUS = [
+    "***7*8*1*" "**7*9***6" "9*31*****" "35*8**6*1" "*********"
+    "1*6**9*48" "*****12*7" "8***7*4**" "*6*3*2***",
+    "***9*2***" "*91***63*" "*3**7**8*" "3*******8" "**9***2**"
+    "5*******7" "*7**8**4*" "*45***81*" "***3*6***",
+    "56***7**9" "*7**48*31" "*********" "43*******" "*8*****9*"
+    "*******26" "*********" "19*36**7*" "7**1***42",
+]
+PEG_BOARDS = [
+    ["*.**.", "*****", "**.**"],
+    ["****", "*.**", "*.**", "*.**"],
+    [".****", "****#", "***.*", "**.**"],
+    [".*****", "******", "******"],
+    ["*****", "*****", "**.**"],
+]
+MN_TARGET = (("1", "2", "3"), ("4", "5", "6"), ("7", "8", "*"))
+MN_STARTS = [
+    (("1", "2", "3"), ("*", "4", "6"), ("7", "5", "8")),
+    (("*", "1", "3"), ("4", "2", "5"), ("7", "8", "6")),
+    (("4", "1", "3"), ("7", "2", "6"), ("*", "5", "8")),
+    (("1", "3", "6"), ("5", "2", "*"), ("4", "7", "8")),
+    (("2", "3", "6"), ("1", "5", "*"), ("4", "7", "8")),
+    (("1", "2", "3"), ("7", "4", "5"), ("*", "8", "6")),
+]
+WORDS = {"cold", "cord", "card", "ward", "warm", "word", "worm", "wore",
+         "core", "care", "dare", "date", "gate", "gave", "cave", "case",
+         "cast", "cost", "most", "mist", "list", "lost", "lose", "love",
+         "live", "line", "fine", "fire", "hire", "here", "hare", "hard",
+         "head", "heal", "heat", "beat", "bear", "dear", "deer", "beer",
+         "bees", "sees", "seed", "need", "feed", "fees", "same", "came",
+         "come", "some", "home", "hole", "pole", "pale", "male", "mile",
+         "mine", "wine", "wide", "wade", "made", "mode", "code", "cope",
+         "hate", "have", "hive"}
+WORD_PAIRS = [("cold", "warm"), ("same", "cost"), ("love", "hate"),
+              ("head", "beer"), ("fine", "wade"), ("mist", "code")]
+
+
+def count_expansions(solver, puzzle, ordered):
+    """
+    Return the number of nodes solver expands solving puzzle, with or
+    without move ordering, and whether it found a solution.
+
+    @type solver: (Puzzle) -> PuzzleNode | None
+    @type puzzle: Puzzle
+    @type ordered: bool
+    @rtype: (int, bool)
+    """
+    cls = type(puzzle)
+    overridden = "ordered_extensions" in cls.__dict__
+    original = cls.ordered_extensions
+    count = [0]
+
+    def counted(self):
+        count[0] += 1
+        return original(self) if ordered else list(self.extensions())
+
+    cls.ordered_extensions = counted
+    try:
+        found = solver(puzzle) is not None
+    finally:
+        if overridden:
+            cls.ordered_extensions = original
+        else:
+            del cls.ordered_extensions
+    return count[0], found
+
+
+def corpus():
+    """
+    Yield (family, solver, puzzle) for each puzzle of the benchmark.
+
+    @rtype: Iterator[(str, (Puzzle) -> PuzzleNode | None, Puzzle)]
+    """
+    for line in SUDOKUS:
+        yield "sudoku", depth_first_solve, parse_sudoku(line)
+    for board in PEG_BOARDS:
+        yield "peg solitaire", depth_first_solve, parse_peg(board)
+    for grid in MN_STARTS:
+        yield "mn", iterative_deepening_solve, MNPuzzle(grid, MN_TARGET)
+    for from_word, to_word in WORD_PAIRS:
+        yield ("word ladder", iterative_deepening_solve,
+               WordLadderPuzzle(from_word, to_word, WORDS))
+
+
+if __name__ == "__main__":
+    totals = {}
+    print("{:14} {:>10} {:>10} {:>8}".format("family", "plain", "ordered",
+                                             "seconds"))
+    for family, solver, puzzle in corpus():
+        start = time()
+        plain, found = count_expansions(solver, puzzle, False)
+        ordered, found_ordered = count_expansions(solver, puzzle, True)
+        assert found == found_ordered
+        print("{:14} {:>10} {:>10} {:>8.2f}".format(family, plain, ordered,
+                                                    time() - start))
+        total = totals.setdefault(family, [0, 0])
+        total[0] += plain
+        total[1] += ordered
+    print()
+    for family, (plain, ordered) in totals.items():
+        print("{:14} {:>10} {:>10} {:>7.1f}%".format(
+            family, plain, ordered, 100 * (plain - ordered) / plain))
@@ -16,6 +16,19 @@ class Puzzle:
         """
         return False
 
+    def heuristic(self):
+        """
+        Return an estimate of how far Puzzle self is from a solution,
+        where smaller is closer and solved puzzles score 0.
+
+        Override this in a subclass to guide informed searches such as
+        puzzle_tools.greedy_best_first_solve.
+
+        @type self: Puzzle
+        @rtype: int
+        """
+        return 0
+
     def is_solved(self):
         """
         Return True iff Puzzle self is solved.
@@ -39,3 +52,45 @@ class Puzzle:
         @rtype: list[Puzzle]
         """
         raise NotImplementedError
+
+    def ordered_extensions(self):
+        """
+        Return the list of extensions of Puzzle self in the order a
+        depth-first search should try them, most promising first.
+
+        Override this in a subclass with a cheap move-ordering rule;
+        by default the order of extensions is kept.
+
+        @type self: Puzzle
+        @rtype: list[Puzzle]
+        """
+        return list(self.extensions())
+
+    def state_key(self):
+        """
+        Return a bytes key for the state of Puzzle self.  Puzzles of
+        the same family (same target, dictionary, board shape...) are
+        equivalent iff their keys are equal, and keys of one family all
+        have the same length.
+
+        Override this in a subclass to make it usable by searches
+        that store states compactly, such as
+        puzzle_tools.external_breadth_first_solve.
+
+        @type self: Puzzle
+        @rtype: bytes
+        """
+        raise NotImplementedError
+
+    def from_state_key(self, key):
+        """
+        Return the Puzzle of the same family as Puzzle self whose
+        state_key is key.
+
+        Override this together with state_key.
+
+        @type self: Puzzle
+        @type key: bytes
+        @rtype: Puzzle
+        """
+        raise NotImplementedError
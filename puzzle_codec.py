@@ -0,0 +1,240 @@
+"""
+Compact binary encodings of puzzle states and solution paths.
+
+A PuzzleCodec is made from a template puzzle that both sides of a
+transfer already hold: the target grid of an MNPuzzle, the symbols of a
+SudokuPuzzle, the board of a GridPegSolitairePuzzle, or the target word
+and dictionary of a WordLadderPuzzle.  Each state is then sent as a few
+bytes of its own:
+
+    sudoku          cells packed in n.bit_length() bits each, 0 for "*"
+                    and i + 1 for the i-th symbol in sorted order
+    mn              the rank of the state (see MNPuzzle.rank)
+    word ladder     the id of the word: CompiledDictionary.word_id, or
+                    its position among the sorted dictionary words of
+                    its length; START_WORD for the template's own
+                    start word, which need not be in the dictionary
+    peg solitaire   the bitboard of GridPegSolitairePuzzle.state_key
+
+Encoded lists of states start with a header, all integers
+little-endian: magic b"PZCD", version (u8), puzzle type tag (u8), bytes
+per state (u16) and number of states (u32).  Decoding reads straight
+from a memoryview of the data without copying it.
+"""
+import struct
+from math import factorial
+from sudoku_puzzle import SudokuPuzzle
+from mn_puzzle import MNPuzzle
+from word_ladder_puzzle import WordLadderPuzzle
+from grid_peg_solitaire_puzzle import GridPegSolitairePuzzle
+from puzzle_tools import path_to_node
+
+MAGIC = b"PZCD"
+VERSION = 1
+# puzzle type tags
+SUDOKU, MN, WORD_LADDER, PEG = 1, 2, 3, 4
+_HEADER = struct.Struct("<4sBBHI")
+_WORD_ID = struct.Struct("<I")
+# word id of the start word of a WordLadderPuzzle template
+START_WORD = 0xFFFFFFFF
+
+
+class PuzzleCodec:
+    """
+    Encoder and decoder of states of puzzles like a template puzzle.
+    """
+
+    def __init__(self, template):
+        """
+        Create a new PuzzleCodec self for puzzles of the same type and
+        with the same fixed parts as template.
+
+        @type self: PuzzleCodec
+        @type template: Puzzle
+        @rtype: None
+        """
+        self.template = template
+        if isinstance(template, SudokuPuzzle):
+            self.tag = SUDOKU
+            self._bits = template._n.bit_length()
+            self.size = (template._n ** 2 * self._bits + 7) // 8
+            self._names = ["*"] + sorted(template._symbol_set)
+        elif isinstance(template, MNPuzzle):
+            self.tag = MN
+            cells = template.n * template.m
+            self.size = ((factorial(cells) - 1).bit_length() + 7) // 8
+        elif isinstance(template, WordLadderPuzzle):
+            self.tag = WORD_LADDER
+            self.size = _WORD_ID.size
+            ws = template._word_set
+            if not hasattr(ws, "word_id"):
+                # plain sets: ids are positions among the sorted words of
+                # the right length, the only ones a ladder can reach
+                self._words = sorted([w for w in ws
+                                      if len(w) == len(template._to_word)])
+                self._ids = {w: i for i, w in enumerate(self._words)}
+        elif isinstance(template, GridPegSolitairePuzzle):
+            self.tag = PEG
+            self.size = len(template.state_key())
+        else:
+            raise TypeError("no encoding for {}".format(
+                type(template).__name__))
+
+    def encode_state(self, puzzle):
+        """
+        Return the size bytes encoding the state of puzzle.
+
+        @type self: PuzzleCodec
+        @type puzzle: Puzzle
+        @rtype: bytes
+
+        >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+        >>> codec = PuzzleCodec(MNPuzzle(target_grid, target_grid))
+        >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+        >>> codec.encode_state(MNPuzzle(start_grid, target_grid))
+        b'v\\x02'
+        """
+        if self.tag == SUDOKU:
+            value = 0
+            for i, code in enumerate(puzzle.state_key()):
+                value |= code << (i * self._bits)
+            return value.to_bytes(self.size, "little")
+        if self.tag == MN:
+            return puzzle.rank().to_bytes(self.size, "little")
+        if self.tag == WORD_LADDER:
+            word, ws = puzzle._from_word, self.template._word_set
+            word_id = (ws.word_id(word) if hasattr(ws, "word_id")
+                       else self._ids.get(word))
+            if word_id is None and word == self.template._from_word:
+                word_id = START_WORD
+            if word_id is None:
+                raise ValueError("{!r} is not in the dictionary".format(word))
+            return _WORD_ID.pack(word_id)
+        return puzzle.state_key()
+
+    def decode_state(self, data, offset=0):
+        """
+        Return the puzzle whose state is encoded at offset in data.
+
+        @type self: PuzzleCodec
+        @type data: bytes | bytearray | memoryview
+        @type offset: int
+        @rtype: Puzzle
+
+        >>> ws = {"same", "came", "case", "cast", "cost", "a"}
+        >>> codec = PuzzleCodec(WordLadderPuzzle("same", "cost", ws))
+        >>> data = codec.encode_state(WordLadderPuzzle("case", "cost", ws))
+        >>> data
+        b'\\x01\\x00\\x00\\x00'
+        >>> codec.decode_state(data)._from_word
+        'case'
+        >>> codec = PuzzleCodec(WordLadderPuzzle("sane", "cost", ws))
+        >>> data = codec.encode_state(codec.template)
+        >>> data, codec.decode_state(data)._from_word
+        (b'\\xff\\xff\\xff\\xff', 'sane')
+        """
+        view = memoryview(data)[offset:offset + self.size]
+        template = self.template
+        if self.tag == SUDOKU:
+            value, mask = int.from_bytes(view, "little"), (1 << self._bits) - 1
+            return SudokuPuzzle(template._n,
+                                [self._names[value >> (i * self._bits) & mask]
+                                 for i in range(template._n ** 2)],
+                                template._symbol_set)
+        if self.tag == MN:
+            return template.from_rank(int.from_bytes(view, "little"))
+        if self.tag == WORD_LADDER:
+            word_id = _WORD_ID.unpack_from(view)[0]
+            ws = template._word_set
+            if word_id == START_WORD:
+                word = template._from_word
+            elif hasattr(ws, "word_id"):
+                word = ws.word(word_id)
+            else:
+                word = self._words[word_id]
+            return WordLadderPuzzle(word, template._to_word, ws)
+        return template.from_state_key(view)
+
+    def encode(self, puzzles):
+        """
+        Return the header and encoded states of the puzzles in puzzles.
+
+        @type self: PuzzleCodec
+        @type puzzles: list[Puzzle]
+        @rtype: bytes
+        """
+        return b"".join([_HEADER.pack(MAGIC, VERSION, self.tag, self.size,
+                                      len(puzzles))] +
+                        [self.encode_state(p) for p in puzzles])
+
+    def decode(self, data):
+        """
+        Return the list of puzzles encoded in data by encode.
+
+        @type self: PuzzleCodec
+        @type data: bytes | bytearray | memoryview
+        @rtype: list[Puzzle]
+
+        >>> grid = ["A", "B", "C", "D"]
+        >>> grid += ["D", "C", "B", "A"]
+        >>> grid += ["*", "D", "*", "*"]
+        >>> grid += ["*", "*", "*", "*"]
+        >>> s = SudokuPuzzle(4, grid, {"A", "B", "C", "D"})
+        >>> codec = PuzzleCodec(s)
+        >>> data = codec.encode([s, s])
+        >>> len(data), codec.decode(data) == [s, s]
+        (24, True)
+        """
+        view = memoryview(data)
+        magic, version, tag, size, count = _HEADER.unpack_from(view)
+        assert magic == MAGIC and version == VERSION
+        assert tag == self.tag and size == self.size
+        return [self.decode_state(view, _HEADER.size + i * size)
+                for i in range(count)]
+
+    def encode_path(self, node):
+        """
+        Return the encoded states along the path of PuzzleNodes
+        starting at node, or b"" if node is None.
+
+        @type self: PuzzleCodec
+        @type node: PuzzleNode | None
+        @rtype: bytes
+        """
+        if node is None:
+            return b""
+        path = [node.puzzle]
+        while node.children:
+            node = node.children[0]
+            path.append(node.puzzle)
+        return self.encode(path)
+
+    def decode_path(self, data):
+        """
+        Return the path of PuzzleNodes encoded in data by encode_path,
+        or None if it encodes no path.
+
+        @type self: PuzzleCodec
+        @type data: bytes | bytearray | memoryview
+        @rtype: PuzzleNode | None
+
+        >>> grid = [["*", "*", ".", "*"]]
+        >>> codec = PuzzleCodec(GridPegSolitairePuzzle(grid, {"*", ".", "#"}))
+        >>> from grid_peg_solitaire_puzzle import bidirectional_solve
+        >>> sol = bidirectional_solve(codec.template)
+        >>> data = codec.encode_path(sol)
+        >>> len(data)
+        15
+        >>> print(codec.decode_path(data).children[0].puzzle)
+        .|.|*|*
+        >>> codec.decode_path(codec.encode_path(None)) is None
+        True
+        """
+        if len(data) == 0:
+            return None
+        return path_to_node(self.decode(data))
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,364 @@
+"""
+Streaming readers and writers for line-oriented puzzle files.
+
+Input files are memory-mapped and parsed one line (or one blank-line
+separated block) at a time, every reader is a generator, and results
+are written as soon as they are produced, so arbitrarily long inputs
+are processed in constant memory.
+
+Formats:
+    sudoku      one puzzle per line, n**2 symbols, empty cells as "*",
+                "." or "0", e.g. the usual 81-character lines
+    mn          blocks of rows in the format of MNPuzzle.__str__,
+                "|"-separated tiles, with "->" before the target rows
+    words       word pairs "from_word to_word", one per line
+    peg         blocks of rows of "*", "." and "#", optionally
+                "|"-separated as in GridPegSolitairePuzzle.__str__
+"""
+import mmap
+import sys
+from sudoku_puzzle import SudokuPuzzle
+from mn_puzzle import MNPuzzle
+from word_ladder_puzzle import WordLadderPuzzle
+from grid_peg_solitaire_puzzle import GridPegSolitairePuzzle
+from puzzle_tools import depth_first_solve, greedy_best_first_solve
+
+# default symbols for sudoku lines, taken in order for an nxn puzzle
+SUDOKU_SYMBOLS = "123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def iter_lines(path):
+    """
+    Yield the lines of file path without their line endings, reading
+    the file through a memory map.
+
+    @type path: str
+    @rtype: Iterator[str]
+    """
+    with open(path, "rb") as f:
+        # mmap refuses empty files
+        if f.seek(0, 2) == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start, size = 0, len(mm)
+            while start < size:
+                end = mm.find(b"\n", start)
+                if end == -1:
+                    end = size
+                yield mm[start:end].decode().rstrip("\r")
+                start = end + 1
+
+
+def iter_blocks(lines):
+    """
+    Yield lists of consecutive non-blank lines from lines, stripped of
+    surrounding whitespace.
+
+    @type lines: Iterable[str]
+    @rtype: Iterator[list[str]]
+
+    >>> list(iter_blocks(["a", "b", "", "", " c ", ""]))
+    [['a', 'b'], ['c']]
+    """
+    block = []
+    for line in lines:
+        line = line.strip()
+        if line:
+            block.append(line)
+        elif block:
+            yield block
+            block = []
+    if block:
+        yield block
+
+
+def read_words(path):
+    """
+    Return the set of whitespace-separated words in file path.
+
+    @type path: str
+    @rtype: set[str]
+    """
+    words = set()
+    for line in iter_lines(path):
+        words.update(line.split())
+    return words
+
+
+def parse_sudoku(line, symbols=None):
+    """
+    Return the SudokuPuzzle written on line.
+
+    @type line: str
+    @type symbols: str | None
+    @rtype: SudokuPuzzle
+
+    >>> print(parse_sudoku("12.434..2..3.3.1"))
+    12|*4
+    34|**
+    -----
+    2*|*3
+    *3|*1
+    """
+    line = line.strip()
+    n = round(len(line) ** (1 / 2))
+    if symbols is None:
+        symbols = SUDOKU_SYMBOLS[:n]
+    cells = ["*" if c in "*.0" else c for c in line]
+    return SudokuPuzzle(n, cells, set(symbols))
+
+
+def read_sudoku(path, symbols=None):
+    """
+    Yield the SudokuPuzzles in file path, one per non-blank line.
+
+    @type path: str
+    @type symbols: str | None
+    @rtype: Iterator[SudokuPuzzle]
+    """
+    for line in iter_lines(path):
+        if line.strip():
+            yield parse_sudoku(line, symbols)
+
+
+def parse_mn(block, to_grid=None):
+    """
+    Return the MNPuzzle written in block.  The target grid follows a
+    "->" line, or is to_grid if block has none.
+
+    @type block: list[str]
+    @type to_grid: tuple[tuple[str]] | None
+    @rtype: MNPuzzle
+
+    >>> mn = parse_mn(["*|2|3", "1|4|5", "->", "1|2|3", "4|5|*"])
+    >>> mn.from_grid
+    (('*', '2', '3'), ('1', '4', '5'))
+    >>> mn.to_grid
+    (('1', '2', '3'), ('4', '5', '*'))
+    """
+    def grid(rows):
+        return tuple(tuple(t.strip() for t in row.split("|"))
+                     for row in rows)
+
+    if "->" in block:
+        i = block.index("->")
+        return MNPuzzle(grid(block[:i]), grid(block[i + 1:]))
+    assert to_grid is not None
+    return MNPuzzle(grid(block), to_grid)
+
+
+def read_mn(path, to_grid=None):
+    """
+    Yield the MNPuzzles in file path, one per blank-line separated
+    block.
+
+    @type path: str
+    @type to_grid: tuple[tuple[str]] | None
+    @rtype: Iterator[MNPuzzle]
+    """
+    for block in iter_blocks(iter_lines(path)):
+        yield parse_mn(block, to_grid)
+
+
+def read_word_pairs(path, ws):
+    """
+    Yield a WordLadderPuzzle over dictionary ws for each
+    "from_word to_word" line of file path.
+
+    @type path: str
+    @type ws: set[str]
+    @rtype: Iterator[WordLadderPuzzle]
+    """
+    for number, line in enumerate(iter_lines(path), 1):
+        words = line.split()
+        if len(words) == 1:
+            raise ValueError("line {} of {}: expected 'from_word to_word', "
+                             "got {!r}".format(number, path, line))
+        if words:
+            yield WordLadderPuzzle(words[0], words[1], ws)
+
+
+def parse_peg(block):
+    """
+    Return the GridPegSolitairePuzzle written in block.
+
+    @type block: list[str]
+    @rtype: GridPegSolitairePuzzle
+
+    >>> print(parse_peg(["#*.", "**."]))
+    #|*|.
+    *|*|.
+    """
+    marker = [[c for c in row if c != "|" and not c.isspace()]
+              for row in block]
+    return GridPegSolitairePuzzle(marker, {"*", ".", "#"})
+
+
+def read_peg(path):
+    """
+    Yield the GridPegSolitairePuzzles in file path, one per blank-line
+    separated block.
+
+    @type path: str
+    @rtype: Iterator[GridPegSolitairePuzzle]
+    """
+    for block in iter_blocks(iter_lines(path)):
+        yield parse_peg(block)
+
+
+def chunked(puzzles, size):
+    """
+    Yield lists of up to size consecutive puzzles from puzzles, e.g. to
+    feed sudoku_puzzle_batch.batch_solve from a stream.
+
+    @type puzzles: Iterable[Puzzle]
+    @type size: int
+    @rtype: Iterator[list[Puzzle]]
+
+    >>> list(chunked(range(5), 2))
+    [[0, 1], [2, 3], [4]]
+    """
+    chunk = []
+    for puzzle in puzzles:
+        chunk.append(puzzle)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def default_solver(puzzle):
+    """
+    Return the solver solve_stream uses for puzzle when given none:
+    depth_first_solve for sudokus and peg solitaire boards, whose moves
+    never lead back to an earlier state, and greedy_best_first_solve,
+    which skips states it has seen, for MNPuzzles and word ladders.
+
+    @type puzzle: Puzzle
+    @rtype: (Puzzle) -> PuzzleNode | None
+
+    >>> default_solver(parse_mn(["*|2", "1|3", "->", "1|2", "3|*"])).__name__
+    'greedy_best_first_solve'
+    """
+    if isinstance(puzzle, (MNPuzzle, WordLadderPuzzle)):
+        return greedy_best_first_solve
+    return depth_first_solve
+
+
+def solve_stream(puzzles, solver=None):
+    """
+    Yield (puzzle, solution) for each puzzle in puzzles, where solution
+    is what solver (default_solver of the puzzle if None) returns for
+    it, or the exception it raised, so one failing puzzle does not end
+    the stream.
+
+    @type puzzles: Iterable[Puzzle]
+    @type solver: (Puzzle) -> PuzzleNode | None
+    @rtype: Iterator[(Puzzle, PuzzleNode | Exception | None)]
+
+    >>> def broken(puzzle):
+    ...     raise RecursionError("too deep")
+    >>> sudoku = parse_sudoku("12.434..2..3.3.1")
+    >>> [format_result(s) for p, s in solve_stream([sudoku], broken)]
+    ['error\\tRecursionError: too deep']
+    """
+    for puzzle in puzzles:
+        try:
+            solution = (solver or default_solver(puzzle))(puzzle)
+        except Exception as e:
+            solution = e
+        yield puzzle, solution
+
+
+def format_state(puzzle):
+    """
+    Return a one-line string for the state of puzzle.
+
+    @type puzzle: Puzzle
+    @rtype: str
+
+    >>> format_state(parse_sudoku("12.434..2..3.3.1"))
+    '12*4 34** 2**3 *3*1'
+    >>> format_state(WordLadderPuzzle("same", "cost", {"same"}))
+    'same'
+    """
+    if isinstance(puzzle, SudokuPuzzle):
+        n = puzzle._n
+        return " ".join("".join(puzzle._symbols[r * n:(r + 1) * n])
+                        for r in range(n))
+    if isinstance(puzzle, MNPuzzle):
+        return " ".join("|".join(row) for row in puzzle.from_grid)
+    if isinstance(puzzle, WordLadderPuzzle):
+        return puzzle._from_word
+    if isinstance(puzzle, GridPegSolitairePuzzle):
+        return " ".join("".join(row) for row in puzzle._marker)
+    return " ".join(str(puzzle).split())
+
+
+def format_result(solution):
+    """
+    Return a one-line string for solution: the number of moves and the
+    states along the path separated by " -> ", "unsolvable", or "error"
+    and the exception if solution is one.
+
+    @type solution: PuzzleNode | Exception | None
+    @rtype: str
+
+    >>> from puzzle_tools import path_to_node
+    >>> ws = {"ab", "bb"}
+    >>> format_result(path_to_node([WordLadderPuzzle("ab", "bb", ws),
+    ...                             WordLadderPuzzle("bb", "bb", ws)]))
+    '1\\tab -> bb'
+    >>> format_result(None)
+    'unsolvable'
+    """
+    if solution is None:
+        return "unsolvable"
+    if isinstance(solution, Exception):
+        return "error\t{}: {}".format(type(solution).__name__, solution)
+    states = [format_state(solution.puzzle)]
+    while solution.children:
+        solution = solution.children[0]
+        states.append(format_state(solution.puzzle))
+    return "{}\t{}".format(len(states) - 1, " -> ".join(states))
+
+
+def write_results(results, out):
+    """
+    Write one line per (puzzle, solution) pair in results to the file
+    object out as soon as it is produced, and return how many lines
+    were written.
+
+    @type results: Iterable[(Puzzle, PuzzleNode | Exception | None)]
+    @type out: io.TextIOBase
+    @rtype: int
+    """
+    count = 0
+    for puzzle, solution in results:
+        out.write(format_result(solution) + "\n")
+        count += 1
+    return count
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
+    # usage: python puzzle_io.py sudoku|mn|peg INPUT [OUTPUT]
+    #        python puzzle_io.py words INPUT WORDS [OUTPUT]
+    if len(sys.argv) >= 3:
+        kind, source = sys.argv[1], sys.argv[2]
+        rest = sys.argv[3:]
+        if kind == "sudoku":
+            stream = read_sudoku(source)
+        elif kind == "mn":
+            stream = read_mn(source)
+        elif kind == "peg":
+            stream = read_peg(source)
+        else:
+            stream = read_word_pairs(source, read_words(rest.pop(0)))
+        if rest:
+            with open(rest[0], "w") as output:
+                write_results(solve_stream(stream), output)
+        else:
+            write_results(solve_stream(stream), sys.stdout)
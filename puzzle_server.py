@@ -0,0 +1,516 @@
+"""
+A long-running local solver server.
+
+The server listens on localhost for HTTP requests:
+
+    POST /solve   body: a JSON puzzle request, answered with a JSON
+                  solution
+    GET /stats    JSON throughput and latency counters
+
+Requests are solved in a pool of worker processes.  Each worker loads
+the word-ladder dictionary once when it starts and keeps its caches
+(the reverse search trees of word ladders) between requests, so a
+request only pays for its own search.  A request that takes longer
+than the server's timeout, waiting for a free worker included, is
+answered with status 504, and the worker busy with it is replaced by
+a fresh one.  An invalid request is answered with status 400, and a
+request whose worker died or whose solver failed with status 500.
+
+Puzzle requests are JSON objects with a "type" and the puzzle itself:
+
+    {"type": "sudoku", "puzzle": "1..4...", "symbols": "1234"}
+    {"type": "mn", "from": [["*", "2"], ["1", "3"]],
+                   "to": [["1", "2"], ["3", "*"]]}
+    {"type": "word_ladder", "from": "same", "to": "cost"}
+    {"type": "peg", "board": ["**.", "#**"]}
+
+and optionally a "strategy" naming an entry of STRATEGIES, or
+"portfolio" to race the PORTFOLIO strategies with
+puzzle_tools.portfolio_solve; /stats counts which of them win for each
+puzzle type.  MNPuzzles
+and word ladders can move back to earlier states, so the strategies
+that would search them forever (see puzzle_tools.is_cyclic) are
+refused for them.
+"""
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import time
+from mn_puzzle import MNPuzzle
+from word_ladder_puzzle import (WordLadderPuzzle, LadderTreeCache,
+                                component_labels)
+from grid_peg_solitaire_puzzle import bidirectional_solve
+from puzzle_io import parse_sudoku, parse_peg, format_state
+from puzzle_tools import (depth_first_solve, breadth_first_solve,
+                          iterative_deepening_solve, adaptive_solve,
+                          greedy_best_first_solve, beam_solve,
+                          portfolio_solve, portfolio_wins, is_cyclic,
+                          safe_strategies, CYCLIC_UNSAFE_SOLVERS)
+
+# strategy name -> function from a Puzzle to a PuzzleNode path or None;
+# "ladder_cache" uses the LadderTreeCache of the worker
+STRATEGIES = {"depth_first": depth_first_solve,
+              "breadth_first": breadth_first_solve,
+              "iterative_deepening": iterative_deepening_solve,
+              "adaptive": adaptive_solve,
+              "greedy": greedy_best_first_solve,
+              "beam": beam_solve,
+              "bidirectional": bidirectional_solve}
+# strategies raced by "portfolio", less those that do not finish on
+# the puzzle (see puzzle_tools.safe_strategies)
+PORTFOLIO = ("depth_first", "breadth_first", "greedy")
+# strategy used for each puzzle type when a request names none
+DEFAULT_STRATEGIES = {"sudoku": "depth_first",
+                      "mn": "greedy",
+                      "word_ladder": "ladder_cache",
+                      "peg": "bidirectional"}
+
+# state kept by each worker process between requests
+_dictionary = set()
+_ladder_cache = LadderTreeCache()
+
+
+def init_worker(words=None):
+    """
+    Load the word-ladder dictionary in file words, either a compiled
+    dictionary (see word_dictionary) or a plain word list, into this
+    process, and label its components so that the first request does
+    not pay for it.
+
+    @type words: str | None
+    @rtype: None
+    """
+    global _dictionary
+    if words is None:
+        _dictionary = set()
+        return
+    with open(words, "rb") as f:
+        compiled = f.read(4) == b"WLAD"
+    if compiled:
+        from word_dictionary import load_dictionary
+        _dictionary = load_dictionary(words)
+    else:
+        from puzzle_io import read_words
+        _dictionary = read_words(words)
+    component_labels(_dictionary)
+
+
+def parse_request(request):
+    """
+    Return the Puzzle described by the JSON object request.
+
+    @type request: dict
+    @rtype: Puzzle
+    """
+    kind = request["type"]
+    if kind == "sudoku":
+        return parse_sudoku(request["puzzle"], request.get("symbols"))
+    if kind == "mn":
+        return MNPuzzle(tuple(tuple(row) for row in request["from"]),
+                        tuple(tuple(row) for row in request["to"]))
+    if kind == "word_ladder":
+        words = request.get("words")
+        return WordLadderPuzzle(request["from"], request["to"],
+                                _dictionary if words is None else set(words))
+    if kind == "peg":
+        return parse_peg(request["board"])
+    raise ValueError("unknown puzzle type {}".format(kind))
+
+
+def solve_request(request):
+    """
+    Return the JSON answer to puzzle request request: the states along
+    the solution (or None if there is none), the number of moves and
+    the strategy used, and for "portfolio" the strategy that won (or
+    None).
+
+    @type request: dict
+    @rtype: dict
+
+    >>> init_worker()
+    >>> answer = solve_request({"type": "word_ladder", "from": "cat",
+    ...                         "to": "dot", "words": ["cot", "dot"]})
+    >>> answer["solution"], answer["moves"], answer["strategy"]
+    (['cat', 'cot', 'dot'], 2, 'ladder_cache')
+    >>> solve_request({"type": "peg", "board": ["**.*"]})["solution"]
+    ['**.*', '..**', '.*..']
+    >>> answer = solve_request({"type": "word_ladder", "from": "cat",
+    ...                         "to": "dot", "words": ["cot", "dot"],
+    ...                         "strategy": "portfolio"})
+    >>> answer["moves"], answer["winner"] in PORTFOLIO
+    (2, True)
+    >>> solve_request({"type": "mn", "strategy": "depth_first",
+    ...                "from": [["*", "2"], ["1", "3"]],
+    ...                "to": [["1", "2"], ["3", "*"]]})
+    Traceback (most recent call last):
+    ...
+    ValueError: strategy depth_first does not finish on mn puzzles
+    """
+    puzzle, name = check_request(request)
+    return _solve(request, puzzle, name)
+
+
+def check_request(request):
+    """
+    Return the Puzzle described by puzzle request request and the name
+    of the strategy to solve it with.  Raise KeyError or ValueError if
+    request is not a valid request.
+
+    @type request: dict
+    @rtype: (Puzzle, str)
+
+    >>> check_request({"type": "peg", "board": ["**.*"]})[1]
+    'bidirectional'
+    >>> check_request({"type": "peg", "board": ["**.*"],
+    ...                "strategy": "guess"})
+    Traceback (most recent call last):
+    ...
+    ValueError: unknown strategy guess
+    """
+    if not isinstance(request, dict):
+        raise ValueError("a puzzle request is a JSON object")
+    puzzle = parse_request(request)
+    name = request.get("strategy", DEFAULT_STRATEGIES[request["type"]])
+    if name not in STRATEGIES and name not in ("ladder_cache", "portfolio"):
+        raise ValueError("unknown strategy {}".format(name))
+    if name == "ladder_cache" and request["type"] != "word_ladder":
+        raise ValueError("strategy ladder_cache only solves word ladders")
+    if is_cyclic(puzzle) and STRATEGIES.get(name) in CYCLIC_UNSAFE_SOLVERS:
+        raise ValueError("strategy {} does not finish on {} puzzles".format(
+            name, request["type"]))
+    return puzzle, name
+
+
+def _solve(request, puzzle, name):
+    # Return the JSON answer to request, whose puzzle and strategy
+    # check_request found, as solve_request does.
+    #
+    # @type request: dict
+    # @type puzzle: Puzzle
+    # @type name: str
+    # @rtype: dict
+    answer = {"strategy": name}
+    if name == "ladder_cache":
+        node = _ladder_cache.solve(puzzle)
+    elif name == "portfolio":
+        before = portfolio_wins.copy()
+        node = portfolio_solve(puzzle, safe_strategies(
+            puzzle, {n: STRATEGIES[n] for n in PORTFOLIO}))
+        answer["winner"] = next(iter(portfolio_wins - before), None)
+    else:
+        node = STRATEGIES[name](puzzle)
+    states = None
+    if node is not None:
+        states = [format_state(node.puzzle)]
+        while node.children:
+            node = node.children[0]
+            states.append(format_state(node.puzzle))
+    answer["solution"] = states
+    answer["moves"] = None if states is None else len(states) - 1
+    return answer
+
+
+class ServerStats:
+    """
+    Thread-safe request counters for a solver server.
+    """
+
+    def __init__(self):
+        """
+        Create a new ServerStats self with all counters at zero.
+
+        @type self: ServerStats
+        @rtype: None
+        """
+        self._lock = threading.Lock()
+        self._start = time()
+        self.requests, self.errors, self.unsolvable = 0, 0, 0
+        self.timeouts = 0
+        self.in_flight = 0
+        self.total_seconds, self.max_seconds = 0.0, 0.0
+        self.by_type = {}
+        # puzzle type -> strategy -> portfolio races won
+        self.portfolio_wins = {}
+
+    def begin(self):
+        """
+        Record that a request has started.
+
+        @type self: ServerStats
+        @rtype: None
+        """
+        with self._lock:
+            self.in_flight += 1
+
+    def end(self, kind, seconds, answer, timed_out=False):
+        """
+        Record that a request for a puzzle of type kind finished after
+        seconds with answer, or failed if answer is None, because it
+        ran out of time if timed_out.
+
+        @type self: ServerStats
+        @type kind: str | None
+        @type seconds: float
+        @type answer: dict | None
+        @type timed_out: bool
+        @rtype: None
+        """
+        with self._lock:
+            self.in_flight -= 1
+            self.requests += 1
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            self.by_type[kind] = self.by_type.get(kind, 0) + 1
+            if timed_out:
+                self.timeouts += 1
+            elif answer is None:
+                self.errors += 1
+            elif answer["solution"] is None:
+                self.unsolvable += 1
+            if answer is not None and answer.get("winner") is not None:
+                wins = self.portfolio_wins.setdefault(kind, {})
+                wins[answer["winner"]] = wins.get(answer["winner"], 0) + 1
+
+    def snapshot(self):
+        """
+        Return the counters of ServerStats self as a JSON object.
+
+        @type self: ServerStats
+        @rtype: dict
+
+        >>> stats = ServerStats()
+        >>> stats.begin()
+        >>> stats.end("peg", 0.5, {"solution": None})
+        >>> s = stats.snapshot()
+        >>> s["requests"], s["unsolvable"], s["mean_seconds"], s["by_type"]
+        (1, 1, 0.5, {'peg': 1})
+        >>> stats.begin()
+        >>> stats.end("mn", 0.5, {"solution": [], "winner": "greedy"})
+        >>> stats.snapshot()["portfolio_wins"]
+        {'mn': {'greedy': 1}}
+        """
+        with self._lock:
+            uptime = time() - self._start
+            return {"uptime_seconds": uptime,
+                    "requests": self.requests,
+                    "errors": self.errors,
+                    "timeouts": self.timeouts,
+                    "unsolvable": self.unsolvable,
+                    "in_flight": self.in_flight,
+                    "requests_per_second": self.requests / uptime,
+                    "mean_seconds": (self.total_seconds / self.requests
+                                     if self.requests else 0.0),
+                    "max_seconds": self.max_seconds,
+                    "by_type": dict(self.by_type),
+                    "portfolio_wins": {k: dict(v) for k, v in
+                                       self.portfolio_wins.items()}}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Answer POST /solve and GET /stats for a PuzzleServer.
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._reply(200, self.server.stats.snapshot())
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/solve":
+            self._reply(404, {"error": "not found"})
+            return
+        stats, start, kind, answer = self.server.stats, time(), None, None
+        timed_out = False
+        stats.begin()
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length))
+            if isinstance(request, dict):
+                kind = request.get("type")
+            answer = self.server.solve(request)
+            answer["seconds"] = time() - start
+            self._reply(200, answer)
+        except TimeoutError as e:
+            timed_out = True
+            self._reply(504, {"error": str(e)})
+        except RuntimeError as e:
+            self._reply(500, {"error": str(e)})
+        except Exception as e:
+            self._reply(400, {"error": "{}: {}".format(type(e).__name__, e)})
+        finally:
+            stats.end(kind, time() - start, answer, timed_out)
+
+    def log_message(self, format, *args):
+        # keep the console quiet; /stats has the counters
+        pass
+
+
+def _serve(words, connection):
+    # Load the dictionary in file words, then answer the requests that
+    # arrive on connection with ("ok", answer), ("invalid", exception)
+    # if check_request rejects them or ("error", exception) if solving
+    # them fails, until it is closed.
+    #
+    # @type words: str | None
+    # @type connection: multiprocessing.connection.Connection
+    # @rtype: None
+    # exit through finally blocks when stopped, so that portfolio_solve
+    # terminates the processes it started
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(1))
+    init_worker(words)
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:
+            return
+        status = "invalid"
+        try:
+            puzzle, name = check_request(request)
+            status = "error"
+            answer = _solve(request, puzzle, name)
+        except Exception as e:
+            # exceptions travel pickled; their message always does
+            try:
+                connection.send((status, e))
+            except Exception:
+                connection.send((status, ValueError(str(e))))
+            continue
+        connection.send(("ok", answer))
+
+
+class _Worker:
+    # A worker process running _serve, and the connection to it.
+
+    def __init__(self, words):
+        self._connection, child = multiprocessing.Pipe()
+        # not a daemon, so that "portfolio" can start processes of its
+        # own; server_close stops it
+        self._process = multiprocessing.Process(target=_serve,
+                                                args=(words, child))
+        self._process.start()
+        child.close()
+
+    def solve(self, request, timeout):
+        # Return the reply of the worker to request, ("died", message)
+        # if the worker process is gone, or None if there is no reply
+        # within timeout seconds.
+        try:
+            self._connection.send(request)
+            if not self._connection.poll(timeout):
+                return None
+            return self._connection.recv()
+        except (EOFError, OSError):
+            return "died", "worker exited with code {}".format(
+                self._process.exitcode)
+
+    def stop(self):
+        self._process.terminate()
+        self._process.join()
+        self._connection.close()
+
+
+class PuzzleServer(ThreadingHTTPServer):
+    """
+    An HTTP server on localhost that solves puzzle requests in a pool
+    of warm worker processes.
+    """
+
+    def __init__(self, port=8765, workers=None, words=None, timeout=60.0):
+        """
+        Create a new PuzzleServer self listening on localhost:port with
+        workers worker processes (one per CPU if None), each loading
+        the dictionary in file words, that gives up on a request after
+        timeout seconds.
+
+        @type self: PuzzleServer
+        @type port: int
+        @type workers: int | None
+        @type words: str | None
+        @type timeout: float
+        @rtype: None
+        """
+        ThreadingHTTPServer.__init__(self, ("127.0.0.1", port), _Handler)
+        self.stats = ServerStats()
+        self.timeout = timeout
+        self._words = words
+        self._workers = workers or os.cpu_count() or 1
+        # workers not busy with a request
+        self._idle = queue.Queue()
+        for _ in range(self._workers):
+            self._idle.put(_Worker(words))
+
+    def solve(self, request):
+        """
+        Return the answer of the next free worker to puzzle request, as
+        solve_request does.  Raise the exception check_request raised if
+        the request is invalid, TimeoutError if no worker answered
+        within timeout seconds, waiting for a free one included, and
+        RuntimeError if the worker died or its solver failed.  A worker
+        that died or did not answer is replaced by a new one.
+
+        @type self: PuzzleServer
+        @type request: dict
+        @rtype: dict
+        """
+        deadline = time() + self.timeout
+        try:
+            worker = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError("no free worker within {} seconds".format(
+                self.timeout))
+        reply = worker.solve(request, max(deadline - time(), 0))
+        if reply is None or reply[0] == "died":
+            worker.stop()
+            self._idle.put(_Worker(self._words))
+            if reply is None:
+                raise TimeoutError("no answer within {} seconds".format(
+                    self.timeout))
+            raise RuntimeError(reply[1])
+        self._idle.put(worker)
+        status, body = reply
+        if status == "invalid":
+            raise body
+        if status == "error":
+            raise RuntimeError("{}: {}".format(type(body).__name__, body))
+        return body
+
+    def server_close(self):
+        """
+        Stop listening and shut down the worker processes.
+
+        @type self: PuzzleServer
+        @rtype: None
+        """
+        ThreadingHTTPServer.server_close(self)
+        for _ in range(self._workers):
+            self._idle.get().stop()
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
+    # usage: python puzzle_server.py [PORT [WORDS [TIMEOUT]]]
+    server = PuzzleServer(int(sys.argv[1]) if len(sys.argv) > 1 else 8765,
+                          words=sys.argv[2] if len(sys.argv) > 2 else None,
+                          timeout=(float(sys.argv[3]) if len(sys.argv) > 3
+                                   else 60.0))
+    print("serving on http://127.0.0.1:{}".format(server.server_address[1]))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
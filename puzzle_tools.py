@@ -2,7 +2,13 @@
 Some functions for working with puzzles
 """
 from puzzle import Puzzle
-from collections import deque
+from collections import Counter, deque
+from queue import Empty
+from time import time
+import heapq
+import multiprocessing
+import os
+import tempfile
 # set higher recursion limit
 # which is needed in PuzzleNode.__str__
 # uncomment the next two lines on a unix platform, say CDF
@@ -20,7 +26,8 @@ def depth_first_solve(puzzle):
     """
     Return a path from PuzzleNode(puzzle) to a PuzzleNode containing
     a solution, with each child containing an extension of the puzzle
-    in its parent.  Return None if this is not possible.
+    in its parent.  Return None if this is not possible.  Extensions
+    are tried in the order of Puzzle.ordered_extensions.
 
     @type puzzle: Puzzle
     @rtype: PuzzleNode
@@ -32,12 +39,14 @@ def depth_first_solve(puzzle):
         return PuzzleNode(puzzle)
     else:
         ret = PuzzleNode(puzzle)
-        for i in puzzle.extensions():
+        for i in puzzle.ordered_extensions():
             cur = depth_first_solve(i)
             if cur is None:
                 continue
             cur.parent = ret
             ret.children.append(cur)
+            return ret
+        return None
 
 
 # implement breadth_first_solve
@@ -61,24 +70,862 @@ def breadth_first_solve(puzzle):
     queue = deque()
     inode = PuzzleNode(puzzle)
     queue.append(inode)
+    seen = {_state_key(puzzle)}
     while queue:
-        cur = queue.pop()
+        cur = queue.popleft()
         if cur.puzzle.fail_fast():
             continue
         if cur.puzzle.is_solved():
-            i1 = cur
-            i2 = cur.parent
-            while i2 is not None:
-                i2.children.append(i1)
-                if len(i2.children) >= 2:
-                    break
-                i1 = i2
-                i2 = i2.parent
+            return _path_from(cur)
         else:
-            for i in cur.extersions():
-                new_node = PuzzleNode(i)
-                new_node.parent = cur
-                queue.append(cur)
+            for i in cur.puzzle.extensions():
+                key = _state_key(i)
+                if key not in seen:
+                    seen.add(key)
+                    new_node = PuzzleNode(i)
+                    new_node.parent = cur
+                    queue.append(new_node)
+    return None
+
+
+def iterative_deepening_solve(puzzle, start_depth=0):
+    """
+    Return a shortest path from PuzzleNode(puzzle) to a PuzzleNode
+    containing a solution, or None if this is not possible.
+
+    Depth-first searches are repeated with depth limits start_depth,
+    start_depth + 1, ... until one finds a solution or no search is
+    cut short by its limit.  Only the current path is kept, and a
+    puzzle already on it is not extended again, so memory grows with
+    the length of the path rather than with the number of puzzles
+    seen.  start_depth must be no more than the length of a shortest
+    solution.
+
+    @type puzzle: Puzzle
+    @type start_depth: int
+    @rtype: PuzzleNode | None
+
+    >>> from mn_puzzle import MNPuzzle
+    >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+    >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+    >>> sol = iterative_deepening_solve(MNPuzzle(start_grid, target_grid))
+    >>> moves = 0
+    >>> while sol.children:
+    ...     sol = sol.children[0]
+    ...     moves += 1
+    >>> moves
+    3
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> ws = {"cat", "cot", "dot", "dog"}
+    >>> iterative_deepening_solve(WordLadderPuzzle("cat", "dig", ws)) is None
+    True
+    """
+    limit = start_depth
+    while True:
+        path, cut = _depth_limited(puzzle, limit)
+        if path is not None:
+            return path_to_node(path)
+        if not cut:
+            return None
+        limit += 1
+
+
+def _depth_limited(puzzle, limit):
+    # Return (path, cut): the list of puzzles from puzzle to a solution
+    # at most limit moves away, or None if there is none, and whether
+    # the search stopped at the limit anywhere.
+    #
+    # @type puzzle: Puzzle
+    # @type limit: int
+    # @rtype: (list[Puzzle] | None, bool)
+    if puzzle.fail_fast():
+        return None, False
+    if puzzle.is_solved():
+        return [puzzle], False
+    if limit == 0:
+        return None, True
+    path, keys = [puzzle], [_state_key(puzzle)]
+    on_path = set(keys)
+    stack = [iter(puzzle.ordered_extensions())]
+    cut = False
+    while stack:
+        child = next(stack[-1], None)
+        if child is None:
+            stack.pop()
+            path.pop()
+            on_path.discard(keys.pop())
+            continue
+        key = _state_key(child)
+        if key in on_path or child.fail_fast():
+            continue
+        if child.is_solved():
+            return path + [child], cut
+        # child is len(path) moves from puzzle
+        if len(path) == limit:
+            cut = True
+            continue
+        path.append(child)
+        keys.append(key)
+        on_path.add(key)
+        stack.append(iter(child.ordered_extensions()))
+    return None, cut
+
+
+def adaptive_solve(puzzle, budget=1000000):
+    """
+    Return a shortest path from PuzzleNode(puzzle) to a PuzzleNode
+    containing a solution, or None if this is not possible.
+
+    The search is breadth-first, one layer at a time, while it stores
+    at most budget puzzles.  Once it stores more, everything stored is
+    dropped and iterative_deepening_solve carries on from the depth of
+    the layer being expanded, since every shallower layer is known to
+    hold no solution.
+
+    @type puzzle: Puzzle
+    @type budget: int
+    @rtype: PuzzleNode | None
+
+    >>> from mn_puzzle import MNPuzzle
+    >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+    >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+    >>> for budget in [5, 1000]:
+    ...     sol = adaptive_solve(MNPuzzle(start_grid, target_grid), budget)
+    ...     moves = 0
+    ...     while sol.children:
+    ...         sol = sol.children[0]
+    ...         moves += 1
+    ...     print(moves)
+    3
+    3
+    """
+    frontier = [PuzzleNode(puzzle)]
+    seen = {_state_key(puzzle)}
+    depth = 0
+    while frontier:
+        layer = []
+        for cur in frontier:
+            if cur.puzzle.fail_fast():
+                continue
+            if cur.puzzle.is_solved():
+                return _path_from(cur)
+            for i in cur.puzzle.extensions():
+                key = _state_key(i)
+                if key not in seen:
+                    seen.add(key)
+                    layer.append(PuzzleNode(i, parent=cur))
+            if len(seen) > budget:
+                frontier = layer = seen = None
+                return iterative_deepening_solve(puzzle, depth)
+        frontier, depth = layer, depth + 1
+    return None
+
+
+def greedy_best_first_solve(puzzle, shorten=False):
+    """
+    Return a path from PuzzleNode(puzzle) to a PuzzleNode containing
+    a solution, always expanding the unexpanded puzzle with the lowest
+    heuristic next, or None if this is not possible.  The path found
+    need not be the shortest; with shorten it is passed through
+    shorten_path.
+
+    @type puzzle: Puzzle
+    @type shorten: bool
+    @rtype: PuzzleNode | None
+
+    >>> from mn_puzzle import MNPuzzle
+    >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+    >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+    >>> sol = greedy_best_first_solve(MNPuzzle(start_grid, target_grid))
+    >>> while sol.children:
+    ...     sol = sol.children[0]
+    >>> sol.puzzle.is_solved()
+    True
+    """
+    # entries are (heuristic, insertion count, node); the count breaks
+    # ties in first-in first-out order and keeps nodes uncompared
+    heap = [(puzzle.heuristic(), 0, PuzzleNode(puzzle))]
+    seen = {_state_key(puzzle)}
+    count = 1
+    while heap:
+        cur = heapq.heappop(heap)[2]
+        if cur.puzzle.fail_fast():
+            continue
+        if cur.puzzle.is_solved():
+            return shorten_path(_path_from(cur)) if shorten \
+                else _path_from(cur)
+        for i in cur.puzzle.extensions():
+            key = _state_key(i)
+            if key not in seen:
+                seen.add(key)
+                heapq.heappush(heap, (i.heuristic(), count,
+                                      PuzzleNode(i, parent=cur)))
+                count += 1
+    return None
+
+
+def beam_solve(puzzle, width=100, max_depth=None, shorten=False):
+    """
+    Return a path from PuzzleNode(puzzle) to a PuzzleNode containing
+    a solution, or None if none was found.
+
+    The search goes one layer at a time, keeping only the width
+    puzzles with the lowest heuristic in each layer, so at most width
+    PuzzleNodes per layer are kept and a solution may be missed.  It
+    stops after max_depth layers if max_depth is given.  With shorten
+    the path found is passed through shorten_path.
+
+    @type puzzle: Puzzle
+    @type width: int
+    @type max_depth: int | None
+    @type shorten: bool
+    @rtype: PuzzleNode | None
+
+    >>> from mn_puzzle import MNPuzzle
+    >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+    >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+    >>> sol = beam_solve(MNPuzzle(start_grid, target_grid), width=2)
+    >>> while sol.children:
+    ...     sol = sol.children[0]
+    >>> sol.puzzle.is_solved()
+    True
+    """
+    assert width > 0
+    beam = [PuzzleNode(puzzle)]
+    seen = {_state_key(puzzle)}
+    depth = 0
+    while beam and (max_depth is None or depth <= max_depth):
+        layer = []
+        for cur in beam:
+            if cur.puzzle.fail_fast():
+                continue
+            if cur.puzzle.is_solved():
+                return shorten_path(_path_from(cur)) if shorten \
+                    else _path_from(cur)
+            for i in cur.puzzle.extensions():
+                key = _state_key(i)
+                if key not in seen:
+                    seen.add(key)
+                    layer.append((i.heuristic(), len(layer),
+                                  PuzzleNode(i, parent=cur)))
+        beam = [x[2] for x in heapq.nsmallest(width, layer)]
+        depth += 1
+    return None
+
+
+def shorten_path(root):
+    """
+    Return a path of PuzzleNodes from the puzzle in root to the puzzle
+    at the end of the path starting at root, in which no puzzle
+    appears twice and no puzzle has a later puzzle of the path among
+    its extensions other than the next one.
+
+    @type root: PuzzleNode
+    @rtype: PuzzleNode
+
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> ws = {"cat", "cot", "cut", "dot"}
+    >>> words = ["cat", "cut", "cat", "cut", "cot", "dot"]
+    >>> node = shorten_path(path_to_node([WordLadderPuzzle(w, "dot", ws)
+    ...                                   for w in words]))
+    >>> path = [node.puzzle.state_key()]
+    >>> while node.children:
+    ...     node = node.children[0]
+    ...     path.append(node.puzzle.state_key())
+    >>> path
+    [b'cat', b'cot', b'dot']
+    """
+    path = [root.puzzle]
+    while root.children:
+        root = root.children[0]
+        path.append(root.puzzle)
+    keys = [_state_key(x) for x in path]
+    result, i = [], 0
+    while True:
+        # skip any loop back to this puzzle
+        i = max([j for j in range(i, len(path)) if keys[j] == keys[i]])
+        result.append(path[i])
+        if i == len(path) - 1:
+            return path_to_node(result)
+        # jump to the last puzzle of the path reachable in one move
+        near = {_state_key(x) for x in path[i].extensions()}
+        i = max([j for j in range(i + 1, len(path)) if keys[j] in near])
+
+
+def _state_key(puzzle):
+    # Return a hashable key identifying the state of puzzle: its
+    # state_key, or its string form if it has none.
+    #
+    # @type puzzle: Puzzle
+    # @rtype: bytes | str
+    try:
+        return puzzle.state_key()
+    except NotImplementedError:
+        return str(puzzle)
+
+
+def _path_from(node):
+    # Return a path of new PuzzleNodes from the root of the tree node
+    # is in down to node, following parents.
+    #
+    # @type node: PuzzleNode
+    # @rtype: PuzzleNode
+    path = []
+    while node is not None:
+        path.append(node.puzzle)
+        node = node.parent
+    path.reverse()
+    return path_to_node(path)
+
+
+def path_to_node(path):
+    """
+    Return the root of a chain of PuzzleNodes holding the puzzles in
+    path, each PuzzleNode having the next one as its only child.
+    Return None if path is empty.
+
+    @type path: list[Puzzle]
+    @rtype: PuzzleNode | None
+
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> ws = {"on", "oo", "no"}
+    >>> root = path_to_node([WordLadderPuzzle("on", "no", ws),
+    ...                      WordLadderPuzzle("no", "no", ws)])
+    >>> root.children[0].parent is root
+    True
+    >>> root.children[0].puzzle.is_solved()
+    True
+    """
+    root = None
+    cur = None
+    for puzzle in path:
+        node = PuzzleNode(puzzle, parent=cur)
+        if cur is None:
+            root = node
+        else:
+            cur.children.append(node)
+        cur = node
+    return root
+
+
+def external_breadth_first_solve(puzzle, directory=None, run_size=100000,
+                                 locality=None):
+    """
+    Return a shortest path from PuzzleNode(puzzle) to a PuzzleNode
+    containing a solution, as breadth_first_solve does, or None if
+    this is not possible, keeping the search on disk.
+
+    Every layer of the search is a file of sorted state keys (see
+    Puzzle.state_key).  Children of a layer are sorted in runs of
+    run_size keys, merged, and checked against earlier layers by
+    merging with their files, so only about run_size keys are in memory
+    at once.  locality is how many earlier layers to check against: 2
+    is enough when every move can be undone (e.g. MNPuzzle), None
+    checks all of them.  Layer files go in a temporary directory inside
+    directory, which is removed afterwards.
+
+    @type puzzle: Puzzle
+    @type directory: str | None
+    @type run_size: int
+    @type locality: int | None
+    @rtype: PuzzleNode | None
+
+    >>> from mn_puzzle import MNPuzzle
+    >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+    >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+    >>> sol = external_breadth_first_solve(MNPuzzle(start_grid, target_grid),
+    ...                                    run_size=2)
+    >>> moves = 0
+    >>> while sol.children:
+    ...     sol = sol.children[0]
+    ...     moves += 1
+    >>> moves
+    3
+    >>> stuck = MNPuzzle((("2", "1", "3"), ("4", "5", "*")), target_grid)
+    >>> external_breadth_first_solve(stuck, locality=2) is None
+    True
+    """
+    start = puzzle.state_key()
+    size = len(start)
+    with tempfile.TemporaryDirectory(dir=directory) as work:
+        layers = [os.path.join(work, "layer0")]
+        with open(layers[0], "wb") as f:
+            f.write(start)
+        while True:
+            runs = []
+            buffer = set()
+            for key in _read_keys(layers[-1], size):
+                cur = puzzle.from_state_key(key)
+                if cur.fail_fast():
+                    continue
+                if cur.is_solved():
+                    return path_to_node(_external_path(puzzle, layers,
+                                                       key, size))
+                buffer.update([x.state_key() for x in cur.extensions()])
+                if len(buffer) >= run_size:
+                    runs.append(_write_run(work, len(runs), buffer))
+                    buffer = set()
+            if buffer:
+                runs.append(_write_run(work, len(runs), buffer))
+            if not runs:
+                return None
+            earlier = layers[-locality:] if locality else layers[:]
+            layers.append(os.path.join(work, "layer{}".format(len(layers))))
+            count = _merge_new(runs, earlier, layers[-1], size)
+            for run in runs:
+                os.remove(run)
+            if count == 0:
+                return None
+
+
+def _read_keys(path, size, block=1 << 16):
+    # Yield the fixed-size keys stored back to back in file path.
+    #
+    # @type path: str
+    # @type size: int
+    # @type block: int
+    # @rtype: Iterator[bytes]
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(size * block)
+            if not data:
+                return
+            for i in range(0, len(data), size):
+                yield data[i:i + size]
+
+
+def _write_run(directory, number, keys):
+    # Write keys sorted to a new run file in directory and return its
+    # path.
+    #
+    # @type directory: str
+    # @type number: int
+    # @type keys: set[bytes]
+    # @rtype: str
+    path = os.path.join(directory, "run{}".format(number))
+    with open(path, "wb") as f:
+        f.write(b"".join(sorted(keys)))
+    return path
+
+
+def _merge_new(runs, earlier, path, size):
+    # Merge the sorted run files runs into file path, dropping repeated
+    # keys and keys found in the sorted layer files earlier, and return
+    # the number of keys written.
+    #
+    # @type runs: list[str]
+    # @type earlier: list[str]
+    # @type path: str
+    # @type size: int
+    # @rtype: int
+    old = [_read_keys(layer, size) for layer in earlier]
+    heads = [next(keys, None) for keys in old]
+    count, last = 0, None
+    with open(path, "wb") as f:
+        for key in heapq.merge(*[_read_keys(run, size) for run in runs]):
+            if key == last:
+                continue
+            last = key
+            seen = False
+            for i in range(len(old)):
+                while heads[i] is not None and heads[i] < key:
+                    heads[i] = next(old[i], None)
+                seen = seen or heads[i] == key
+            if not seen:
+                f.write(key)
+                count += 1
+    return count
+
+
+def _external_path(puzzle, layers, key, size):
+    # Return the list of puzzles from puzzle to the state with key in
+    # the last of layers, finding each parent by scanning the layer
+    # before.
+    #
+    # @type puzzle: Puzzle
+    # @type layers: list[str]
+    # @type key: bytes
+    # @type size: int
+    # @rtype: list[Puzzle]
+    path = [puzzle.from_state_key(key)]
+    for layer in reversed(layers[:-1]):
+        for parent in _read_keys(layer, size):
+            cur = puzzle.from_state_key(parent)
+            if (not cur.fail_fast() and
+                    key in [x.state_key() for x in cur.extensions()]):
+                path.append(cur)
+                key = parent
+                break
+    path.reverse()
+    return path
+
+
+# strategy name -> number of races won in portfolio_solve
+portfolio_wins = Counter()
+# strategy name -> number of times it crashed in portfolio_solve
+portfolio_crashes = Counter()
+
+
+def portfolio_solve(puzzle, strategies=None, optimal=False, timeout=None):
+    """
+    Return a path from PuzzleNode(puzzle) to a PuzzleNode containing
+    a solution, or None if this is not possible or no strategy found
+    one within timeout seconds.
+
+    Every solver in strategies, a dict from names to functions from a
+    Puzzle to a path (by default depth-first, breadth-first and greedy
+    search, less depth-first search if puzzle is cyclic; see
+    safe_strategies), runs on puzzle in its own process.  The first path found
+    is returned and the other processes are terminated.  With optimal
+    only paths from the solvers in OPTIMAL_SOLVERS, which are shortest,
+    are taken.  A solver from OPTIMAL_SOLVERS finding no path ends the
+    race with None; other solvers finding none just drop out.  The name
+    of the winning strategy is counted in portfolio_wins.
+
+    A solver that raises an exception, or whose process dies, also
+    drops out and is counted in portfolio_crashes.  If the race then
+    ends without a path, RuntimeError is raised with the first failure
+    rather than None returned, as the puzzle may have a solution.
+
+    @type puzzle: Puzzle
+    @type strategies: dict[str, (Puzzle) -> PuzzleNode | None] | None
+    @type optimal: bool
+    @type timeout: float | None
+    @rtype: PuzzleNode | None
+
+    >>> from mn_puzzle import MNPuzzle
+    >>> target_grid = (("1", "2", "3"), ("4", "5", "*"))
+    >>> start_grid = (("*", "2", "3"), ("1", "4", "5"))
+    >>> portfolio_wins.clear()
+    >>> portfolio_crashes.clear()
+    >>> sol = portfolio_solve(MNPuzzle(start_grid, target_grid),
+    ...                       optimal=True)
+    >>> moves = 0
+    >>> while sol.children:
+    ...     sol = sol.children[0]
+    ...     moves += 1
+    >>> moves, portfolio_wins, portfolio_crashes
+    (3, Counter({'breadth_first': 1}), Counter())
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> ws = {"cat", "cot", "dot", "dog"}
+    >>> portfolio_solve(WordLadderPuzzle("cat", "dig", ws)) is None
+    True
+    >>> sol = portfolio_solve(WordLadderPuzzle("qat", "dot", {"qot", "dot"}),
+    ...                       optimal=True)
+    >>> sol.children[0].puzzle._from_word
+    'qot'
+    """
+    if strategies is None:
+        strategies = safe_strategies(puzzle, {
+            "depth_first": depth_first_solve,
+            "breadth_first": breadth_first_solve,
+            "greedy": greedy_best_first_solve})
+    assert not optimal or any([solver in OPTIMAL_SOLVERS
+                               for solver in strategies.values()])
+    results = multiprocessing.Queue()
+    processes = {name: multiprocessing.Process(
+                     target=_portfolio_worker,
+                     args=(name, solver, puzzle, results), daemon=True)
+                 for name, solver in strategies.items()}
+    for process in processes.values():
+        process.start()
+    deadline = None if timeout is None else time() + timeout
+    pending, failures = set(processes), []
+    try:
+        while pending and (deadline is None or time() < deadline):
+            try:
+                name, failed, data = results.get(timeout=0.05)
+            except Empty:
+                # a process that died will never answer
+                for name in list(pending):
+                    if processes[name].exitcode not in (None, 0):
+                        pending.discard(name)
+                        portfolio_crashes[name] += 1
+                        failures.append("{}: exit code {}".format(
+                            name, processes[name].exitcode))
+                continue
+            pending.discard(name)
+            if failed:
+                portfolio_crashes[name] += 1
+                failures.append("{}: {}".format(name, data))
+                continue
+            complete = strategies[name] in OPTIMAL_SOLVERS
+            if optimal and not complete:
+                continue
+            path = _decode_path(puzzle, data)
+            if path is None and not complete:
+                continue
+            if path is not None:
+                portfolio_wins[name] += 1
+            return path
+        if failures:
+            raise RuntimeError("portfolio strategies failed: " +
+                               "; ".join(failures))
+        return None
+    finally:
+        for process in processes.values():
+            if process.is_alive():
+                process.terminate()
+            process.join()
+
+
+def _portfolio_worker(name, solver, puzzle, results):
+    # Put (name, False, data) on queue results, where data is the path
+    # solver finds from puzzle encoded by _encode_path, or (name, True,
+    # message) if solver raises an exception.
+    #
+    # @type name: str
+    # @type solver: (Puzzle) -> PuzzleNode | None
+    # @type puzzle: Puzzle
+    # @type results: multiprocessing.Queue
+    # @rtype: None
+    try:
+        results.put((name, False, _encode_path(puzzle, solver(puzzle))))
+    except Exception as e:
+        results.put((name, True, "{}: {}".format(type(e).__name__, e)))
+
+
+def _encode_path(puzzle, node):
+    # Return the path starting at node, of puzzles like puzzle, encoded
+    # by puzzle_codec, or as a list of puzzles (pickled on the way) if
+    # it cannot encode them.
+    #
+    # @type puzzle: Puzzle
+    # @type node: PuzzleNode | None
+    # @rtype: bytes | list[Puzzle]
+    from puzzle_codec import PuzzleCodec
+    try:
+        return PuzzleCodec(puzzle).encode_path(node)
+    except Exception:
+        data = []
+        while node is not None:
+            data.append(node.puzzle)
+            node = node.children[0] if node.children else None
+        return data
+
+
+def _decode_path(puzzle, data):
+    # Return the path encoded in data by _encode_path for puzzle.
+    #
+    # @type puzzle: Puzzle
+    # @type data: bytes | list[Puzzle]
+    # @rtype: PuzzleNode | None
+    if isinstance(data, list):
+        return path_to_node(data)
+    from puzzle_codec import PuzzleCodec
+    return PuzzleCodec(puzzle).decode_path(data)
+
+
+# solvers that always return a shortest path, or None only when there
+# is no path at all
+OPTIMAL_SOLVERS = {breadth_first_solve, iterative_deepening_solve,
+                   adaptive_solve, external_breadth_first_solve}
+# solvers that may never finish on a cyclic puzzle (see is_cyclic)
+CYCLIC_UNSAFE_SOLVERS = {depth_first_solve}
+
+
+def is_cyclic(puzzle):
+    """
+    Return whether the moves of puzzle can lead back to an earlier
+    state, as those of MNPuzzle and WordLadderPuzzle can, so that the
+    solvers in CYCLIC_UNSAFE_SOLVERS may search it forever.
+
+    @type puzzle: Puzzle
+    @rtype: bool
+
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> from sudoku_puzzle import SudokuPuzzle
+    >>> is_cyclic(WordLadderPuzzle("cat", "dot", {"cot", "dot"}))
+    True
+    >>> is_cyclic(SudokuPuzzle(4, ["*"] * 16, {"A", "B", "C", "D"}))
+    False
+    """
+    from mn_puzzle import MNPuzzle
+    from word_ladder_puzzle import WordLadderPuzzle
+    return isinstance(puzzle, (MNPuzzle, WordLadderPuzzle))
+
+
+def safe_strategies(puzzle, strategies):
+    """
+    Return the strategies in strategies, a dict from names to solvers,
+    that finish on puzzle: all of them, less those in
+    CYCLIC_UNSAFE_SOLVERS if puzzle is cyclic.
+
+    @type puzzle: Puzzle
+    @type strategies: dict[str, (Puzzle) -> PuzzleNode | None]
+    @rtype: dict[str, (Puzzle) -> PuzzleNode | None]
+    """
+    if not is_cyclic(puzzle):
+        return dict(strategies)
+    return {name: solver for name, solver in strategies.items()
+            if solver not in CYCLIC_UNSAFE_SOLVERS}
+
+
+def parallel_depth_first_solve(puzzle, workers=None, table=None):
+    """
+    Return a path from PuzzleNode(puzzle) to a PuzzleNode containing
+    a solution, or None if this is not possible.
+
+    The puzzles a few moves from puzzle are dealt out to workers
+    processes (one per CPU if None), which search depth first below
+    them.  The processes share the TranspositionTable table, a new one
+    if None, so a puzzle one of them has reached is skipped by the
+    others unless they reach it in fewer moves.  Pass a table to read
+    its statistics afterwards.  If no process finds a path and one of
+    them failed, RuntimeError is raised with the failures rather than
+    None returned.
+
+    @type puzzle: Puzzle
+    @type workers: int | None
+    @type table: TranspositionTable | None
+    @rtype: PuzzleNode | None
+
+    >>> from transposition_table import TranspositionTable
+    >>> from grid_peg_solitaire_puzzle import GridPegSolitairePuzzle
+    >>> grid = [["*", "*", "*", "*", "*"], ["*", "*", "*", "*", "*"],
+    ...         ["*", "*", ".", "*", "*"]]
+    >>> table = TranspositionTable(1 << 12)
+    >>> sol = parallel_depth_first_solve(
+    ...     GridPegSolitairePuzzle(grid, {"*", ".", "#"}), 2, table)
+    >>> while sol.children:
+    ...     sol = sol.children[0]
+    >>> sol.puzzle.is_solved(), table.statistics()["probes"] > 0
+    (True, True)
+    >>> table.close()
+    >>> from word_ladder_puzzle import WordLadderPuzzle
+    >>> ws = {"cat", "cot", "dot", "dog"}
+    >>> parallel_depth_first_solve(WordLadderPuzzle("cat", "dig", ws)) is None
+    True
+    >>> ws = {"bat", "cat", "hat", "mat", "qot", "dot"}
+    >>> sol = parallel_depth_first_solve(WordLadderPuzzle("qat", "dot", ws), 1)
+    >>> sol.children[0].puzzle._from_word
+    'qot'
+    """
+    from transposition_table import TranspositionTable
+    if workers is None:
+        workers = os.cpu_count() or 1
+    # expand layers until there is work for every process
+    frontier, seen = [[puzzle]], {_state_key(puzzle)}
+    while frontier and len(frontier) < 4 * workers:
+        layer = []
+        for path in frontier:
+            if path[-1].fail_fast():
+                continue
+            if path[-1].is_solved():
+                return path_to_node(path)
+            for i in path[-1].extensions():
+                key = _state_key(i)
+                if key not in seen:
+                    seen.add(key)
+                    layer.append(path + [i])
+        frontier = layer
+    if not frontier:
+        return None
+    own = table is None
+    if own:
+        table = TranspositionTable()
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(
+                     target=_parallel_worker,
+                     args=(i, frontier[i::workers], table, results),
+                     daemon=True)
+                 for i in range(min(workers, len(frontier)))]
+    for process in processes:
+        process.start()
+    pending, failures = set(range(len(processes))), []
+    try:
+        while pending:
+            try:
+                index, failed, data = results.get(timeout=0.05)
+            except Empty:
+                # a process that died will never answer
+                for i in list(pending):
+                    if processes[i].exitcode not in (None, 0):
+                        pending.discard(i)
+                        failures.append("worker {}: exit code {}".format(
+                            i, processes[i].exitcode))
+                continue
+            pending.discard(index)
+            if failed:
+                failures.append("worker {}: {}".format(index, data))
+            elif data is not None:
+                return _decode_path(puzzle, data)
+        if failures:
+            raise RuntimeError("parallel search failed: " +
+                               "; ".join(failures))
+        return None
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+        if own:
+            table.close()
+
+
+def _parallel_worker(index, paths, table, results):
+    # Put (index, False, data) on queue results, where data is the
+    # first path to a solution found below the last puzzle of a path in
+    # paths, encoded by _encode_path, or None if there is none; or
+    # (index, True, message) if the search raises an exception.
+    #
+    # @type index: int
+    # @type paths: list[list[Puzzle]]
+    # @type table: TranspositionTable
+    # @type results: multiprocessing.Queue
+    # @rtype: None
+    from transposition_table import COUNTERS
+    table.counter = index % COUNTERS
+    try:
+        for path in paths:
+            found = _shared_depth_first(path, table)
+            if found is not None:
+                results.put((index, False,
+                             _encode_path(path[0], path_to_node(found))))
+                return
+    except Exception as e:
+        results.put((index, True, "{}: {}".format(type(e).__name__, e)))
+        return
+    results.put((index, False, None))
+
+
+def _shared_depth_first(path, table):
+    # Return the list of puzzles from the first puzzle of path to a
+    # solution below its last puzzle, or None if there is none,
+    # skipping puzzles table has seen at the same or a smaller depth.
+    #
+    # @type path: list[Puzzle]
+    # @type table: TranspositionTable
+    # @rtype: list[Puzzle] | None
+    cur = path[-1]
+    if (table.visit(_state_key(cur), len(path) - 1) or cur.fail_fast()):
+        return None
+    if cur.is_solved():
+        return path
+    base = len(path)
+    path, keys = path[:], [_state_key(x) for x in path]
+    # the table may drop entries, so cycles are also checked locally
+    on_path = set(keys)
+    stack = [iter(cur.ordered_extensions())]
+    while stack:
+        child = next(stack[-1], None)
+        if child is None:
+            stack.pop()
+            if len(path) > base:
+                path.pop()
+                on_path.discard(keys.pop())
+            continue
+        key = _state_key(child)
+        if (key in on_path or table.visit(key, len(path)) or
+                child.fail_fast()):
+            continue
+        if child.is_solved():
+            return path + [child]
+        path.append(child)
+        keys.append(key)
+        on_path.add(key)
+        stack.append(iter(child.ordered_extensions()))
+    return None
 
 
 # Class PuzzleNode helps build trees of PuzzleNodes that have
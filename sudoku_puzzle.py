@@ -1,4 +1,38 @@
 from puzzle import Puzzle
+from collections import namedtuple
+
+# cell positions of nxn sudokus, shared by every SudokuPuzzle of size n:
+# side is the side of a subsquare, units lists the rows, then columns,
+# then subsquares, and row, column, subsquare and peers give for each
+# position the positions in its row, column and subsquare, and in any
+# of them except the position itself
+_Units = namedtuple("_Units", ["side", "units", "row", "column",
+                               "subsquare", "peers"])
+_units = {}
+
+
+def _units_for(n):
+    # Return the _Units of nxn sudokus, building them on first use.
+    #
+    # @type n: int
+    # @rtype: _Units
+    if n not in _units:
+        side = round(n ** (1 / 2))
+        rows = [tuple(range(r * n, (r + 1) * n)) for r in range(n)]
+        columns = [tuple(range(c, n * n, n)) for c in range(n)]
+        squares = [tuple((r + i) * n + c + j
+                         for i in range(side) for j in range(side))
+                   for r in range(0, n, side) for c in range(0, n, side)]
+        row = tuple(rows[m // n] for m in range(n * n))
+        column = tuple(columns[m % n] for m in range(n * n))
+        subsquare = tuple(squares[(m // n) // side * side + m % n // side]
+                          for m in range(n * n))
+        peers = tuple(tuple(sorted((set(row[m]) | set(column[m]) |
+                                    set(subsquare[m])) - {m}))
+                      for m in range(n * n))
+        _units[n] = _Units(side, tuple(rows + columns + squares), row,
+                           column, subsquare, peers)
+    return _units[n]
 
 
 class SudokuPuzzle(Puzzle):
@@ -71,43 +105,14 @@ class SudokuPuzzle(Puzzle):
         *D|**
         **|**
         """
-
-        def row_pickets(row):
-            """
-            Return string of characters in row with | divider
-            between groups of sqrt(n)
-
-            @type row: list[str]
-            @rtype: str
-            """
-            string_list = []
-            r = round(self._n ** (1 / 2))
-            for i in range(self._n):
-                if i > 0 and i % r == 0:
-                    string_list.append("|")
-                string_list.append(row[i])
-            return "".join(string_list)
-
-        def table_dividers(table):
-            """
-            Return rows of strings in table with
-            "-----" dividers between groups of sqrt(n) rows.
-
-            @type table: list[str]
-            @rtype: list[str]
-            """
-            r = round(self._n ** (1 / 2))
-            t, divider = [], "-" * (self._n + r - 1)
-            for i in range(self._n):
-                if i > 0 and i % r == 0:
-                    t.append(divider)
-                t.append(table[i])
-            return t
-
-        rows = [row_pickets([self._symbols[r * self._n + c]
-                             for c in range(self._n)])
-                for r in range(self._n)]
-        rows = table_dividers(rows)
+        n, r = self._n, _units_for(self._n).side
+        rows = []
+        for i in range(n):
+            if i > 0 and i % r == 0:
+                rows.append("-" * (n + r - 1))
+            rows.append("|".join("".join(self._symbols[i * n + j:
+                                                       i * n + j + r])
+                                 for j in range(0, n, r)))
         return "\n".join(rows)
 
     def is_solved(self):
@@ -131,13 +136,11 @@ class SudokuPuzzle(Puzzle):
         False
         """
         # convenient names
-        n, symbols = self._n, self._symbols
+        symbols = self._symbols
         # no "*" left and all rows, column, subsquares have correct symbols
         return ("*" not in symbols and
-                all([(self._row_set(i) == self._symbol_set and
-                      self._column_set(i) == self._symbol_set and
-                      self._subsquare_set(i) ==
-                      self._symbol_set) for i in range(n ** 2)]))
+                all([set([symbols[p] for p in unit]) == self._symbol_set
+                     for unit in _units_for(self._n).units]))
 
     def extensions(self):
         """
@@ -167,19 +170,66 @@ class SudokuPuzzle(Puzzle):
             # return an empty list
             return [_ for _ in []]
         else:
-            # position of first empty position
-            i = symbols.index("*")
-            # allowed symbols at position i
-            # A | B == A.union(B)
-            allowed_symbols = (self._symbol_set -
-                               (self._row_set(i) |
-                                self._column_set(i) |
-                                self._subsquare_set(i)))
+            # the empty position with the fewest allowed symbols
+            i, allowed_symbols = self._most_constrained()
             # list of SudokuPuzzles with each legal digit at position i
             return (
                 [SudokuPuzzle(n,
                  symbols[:i] + [d] + symbols[i + 1:], symbol_set)
-                 for d in allowed_symbols])
+                 for d in sorted(allowed_symbols)])
+
+    def _most_constrained(self):
+        # Return the empty position of self with the fewest allowed
+        # symbols, the first such in reading order, and the set of those
+        # symbols.  Filling it first keeps the search tree narrow: a
+        # position with one allowed symbol is filled without branching.
+        #
+        # @type self: SudokuPuzzle
+        # @rtype: (int, set[str])
+        symbols, peers = self._symbols, _units_for(self._n).peers
+        best, best_allowed = None, None
+        for i in range(len(symbols)):
+            if symbols[i] == "*":
+                # allowed symbols at position i: those of no peer of i
+                allowed = self._symbol_set - set([symbols[p]
+                                                  for p in peers[i]])
+                if best is None or len(allowed) < len(best_allowed):
+                    best, best_allowed = i, allowed
+                    if len(allowed) <= 1:
+                        break
+        return best, best_allowed
+
+    def ordered_extensions(self):
+        """
+        Return the extensions of SudokuPuzzle self, which all fill its
+        most constrained empty position, least constraining symbol
+        first: the symbol that the fewest empty peers of that position
+        could still take.
+
+        @type self: SudokuPuzzle
+        @rtype: list[SudokuPuzzle]
+
+        >>> grid = ["*", "B", "*", "D"]
+        >>> grid += ["*", "*", "*", "*"]
+        >>> grid += ["*", "*", "*", "C"]
+        >>> grid += ["*", "C", "*", "*"]
+        >>> s = SudokuPuzzle(4, grid, {"A", "B", "C", "D"})
+        >>> [x._symbols[0] for x in s.ordered_extensions()]
+        ['C', 'A']
+        """
+        symbols, extensions = self._symbols, self.extensions()
+        if len(extensions) < 2:
+            return extensions
+        i, peers = self._most_constrained()[0], _units_for(self._n).peers
+        # how many empty peers of i each symbol is still allowed in
+        taken = {d: 0 for d in self._symbol_set}
+        for p in peers[i]:
+            if symbols[p] == "*":
+                for d in self._symbol_set - set([symbols[q]
+                                                 for q in peers[p]]):
+                    taken[d] += 1
+        return sorted(extensions,
+                      key=lambda x: (taken[x._symbols[i]], x._symbols[i]))
 
     # override fail_fast
     # Notice that it is not possible to complete a sudoku puzzle if there
@@ -209,23 +259,67 @@ class SudokuPuzzle(Puzzle):
         >>> s1.fail_fast()
         False
         """
-        index = 0
-        for m in self._symbols:
-            # if the symbol is empty
-            if m == "*":
-                result = False
-                for sym in self._symbol_set:
-                    # if there is a solution result is True
-                    if (sym not in self._row_set(index)) and \
-                       (sym not in self._column_set(index)) and \
-                       (sym not in self._subsquare_set(index)):
-                        result = True
-                # need to change True for False by description of a method
-                if not result:
-                    return True
-            index += 1
+        symbols, peers = self._symbols, _units_for(self._n).peers
+        for index in range(len(symbols)):
+            # an empty position whose peers use up every symbol
+            if (symbols[index] == "*" and
+                    self._symbol_set <= set([symbols[p]
+                                             for p in peers[index]])):
+                return True
         return False
 
+    def heuristic(self):
+        """
+        Return the number of empty positions in SudokuPuzzle self.
+
+        @type self: SudokuPuzzle
+        @rtype: int
+
+        >>> grid = ["A", "B", "C", "D"]
+        >>> grid += ["D", "C", "B", "A"]
+        >>> grid += ["*", "D", "*", "*"]
+        >>> grid += ["*", "*", "*", "*"]
+        >>> SudokuPuzzle(4, grid, {"A", "B", "C", "D"}).heuristic()
+        7
+        """
+        return self._symbols.count("*")
+
+    def state_key(self):
+        """
+        Return a bytes key for the symbols of self: one byte per cell,
+        0 for "*" and i + 1 for the i-th symbol of symbol_set in sorted
+        order.
+
+        @type self: SudokuPuzzle
+        @rtype: bytes
+
+        >>> grid = ["A", "B", "C", "D"]
+        >>> grid += ["D", "C", "B", "A"]
+        >>> grid += ["*", "D", "*", "*"]
+        >>> grid += ["*", "*", "*", "*"]
+        >>> s = SudokuPuzzle(4, grid, {"A", "B", "C", "D"})
+        >>> list(s.state_key()[:9])
+        [1, 2, 3, 4, 4, 3, 2, 1, 0]
+        >>> s.from_state_key(s.state_key()) == s
+        True
+        """
+        code = {d: i + 1 for i, d in enumerate(sorted(self._symbol_set))}
+        code["*"] = 0
+        return bytes([code[d] for d in self._symbols])
+
+    def from_state_key(self, key):
+        """
+        Return the SudokuPuzzle with the same size and symbol_set as
+        self whose state_key is key.
+
+        @type self: SudokuPuzzle
+        @type key: bytes
+        @rtype: SudokuPuzzle
+        """
+        names = ["*"] + sorted(self._symbol_set)
+        return SudokuPuzzle(self._n, [names[i] for i in key],
+                            self._symbol_set)
+
     # some helper methods
     def _row_set(self, m):
         #
@@ -235,12 +329,8 @@ class SudokuPuzzle(Puzzle):
         # @type self: SudokuPuzzle
         # @type m: int
         assert 0 <= m < self._n ** 2
-        # convenient names
-        n, symbols = self._n, self._symbols
-        # first position in m's row
-        r = (m // n) * n
-        # set of elements from symbols[r] .. symbols[r+n-1]
-        return set([symbols[r + i] for i in range(n)])
+        symbols = self._symbols
+        return set([symbols[p] for p in _units_for(self._n).row[m]])
 
     def _column_set(self, m):
         # Return set of symbols in column of SudokuPuzzle self's symbols
@@ -248,14 +338,9 @@ class SudokuPuzzle(Puzzle):
         #
         # @type self: SudokuPuzzle
         # @type m: int
-        assert 0 <= m <= self._n ** 2
-        # convenient names
-        symbols, n = self._symbols, self._n
-        # first position in m's column
-        c = m % n
-        # set of elements from symbols[c], symbols[c + n],
-        # ... symbols[c + (n * (n-1))]
-        return set([symbols[c + (i * n)] for i in range(n)])
+        assert 0 <= m < self._n ** 2
+        symbols = self._symbols
+        return set([symbols[p] for p in _units_for(self._n).column[m]])
 
     def _subsquare_set(self, m):
         # Return set of symbols in subsquare of SudokuPuzzle self's symbols
@@ -264,17 +349,8 @@ class SudokuPuzzle(Puzzle):
         # @type self: SudokuPuzzle
         # @type m: int
         assert 0 <= m < self._n ** 2
-        # convenient names
-        n, symbols = self._n, self._symbols
-        # row, column where m occur
-        row, col = m // n, m % n
-        # length of subsquares
-        ss = round(n ** (1 / 2))
-        # upper-left position of m's subsquare
-        ul = (((row // ss) * ss) * n) + ((col // ss) * ss)
-        # return set of symbols from subsquare starting at ul
-        return set(
-            [symbols[ul + i + n * j] for i in range(ss) for j in range(ss)])
+        symbols = self._symbols
+        return set([symbols[p] for p in _units_for(self._n).subsquare[m]])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,271 @@
+"""
+Batched validation and constraint propagation for SudokuPuzzles.
+
+A batch of N nxn SudokuPuzzles sharing a symbol set is held as an
+(N, n, n) integer array, with 0 for "*" and 1..n for the symbols in
+sorted order.  Row, column and subsquare checks are reductions over
+one-hot (N, n, n, n) views of that array, so a whole batch is checked
+or propagated at once.
+"""
+import numpy as np
+from sudoku_puzzle import SudokuPuzzle
+from puzzle_tools import depth_first_solve
+
+
+def load_batch(puzzles):
+    """
+    Return an (N, n, n) array holding the grids of puzzles together
+    with the list of symbols that values 1..n stand for.
+
+    @type puzzles: list[SudokuPuzzle]
+    @rtype: (numpy.ndarray, list[str])
+
+    >>> grid = ["A", "B", "C", "D"]
+    >>> grid += ["D", "C", "B", "A"]
+    >>> grid += ["*", "D", "*", "*"]
+    >>> grid += ["*", "*", "*", "*"]
+    >>> s = SudokuPuzzle(4, grid, {"A", "B", "C", "D"})
+    >>> grids, symbols = load_batch([s])
+    >>> grids.shape
+    (1, 4, 4)
+    >>> grids[0, 2].tolist()
+    [0, 4, 0, 0]
+    """
+    assert len(puzzles) > 0
+    # puzzles in a batch share their size and symbols
+    n, symbol_set = puzzles[0]._n, puzzles[0]._symbol_set
+    assert all([p._n == n and p._symbol_set == symbol_set for p in puzzles])
+    symbols = sorted(symbol_set)
+    code = {s: i + 1 for i, s in enumerate(symbols)}
+    code["*"] = 0
+    grids = np.array([[code[s] for s in p._symbols] for p in puzzles],
+                     dtype=np.uint8)
+    return grids.reshape(len(puzzles), n, n), symbols
+
+
+def unload_batch(grids, symbols):
+    """
+    Return the list of SudokuPuzzles held in grids.
+
+    @type grids: numpy.ndarray
+    @type symbols: list[str]
+    @rtype: list[SudokuPuzzle]
+    """
+    names = ["*"] + symbols
+    n = grids.shape[1]
+    return [SudokuPuzzle(n, [names[v] for v in grid.ravel().tolist()],
+                         set(symbols))
+            for grid in grids]
+
+
+def _one_hot(grids):
+    # Return (N, n, n, n) array which is True at [k, i, j, v] iff
+    # cell (i, j) of grid k holds value v + 1.
+    #
+    # @type grids: numpy.ndarray
+    # @rtype: numpy.ndarray
+    n = grids.shape[1]
+    return grids[..., None] == np.arange(1, n + 1, dtype=grids.dtype)
+
+
+def _unit_counts(cells):
+    # Return how often each value is flagged in cells in every row,
+    # column and subsquare, with shapes (N, n, n), (N, n, n) and
+    # (N, r, r, n) for subsquares of side r.
+    #
+    # @type cells: numpy.ndarray
+    # @rtype: (numpy.ndarray, numpy.ndarray, numpy.ndarray)
+    size, n = cells.shape[0], cells.shape[1]
+    r = round(n ** (1 / 2))
+    rows = cells.sum(axis=2)
+    columns = cells.sum(axis=1)
+    boxes = cells.reshape(size, r, r, r, r, n).sum(axis=(2, 4))
+    return rows, columns, boxes
+
+
+def _spread_boxes(boxes):
+    # Return the (N, r, r, n) per-subsquare array boxes repeated over
+    # the cells of each subsquare, giving shape (N, n, n, n).
+    #
+    # @type boxes: numpy.ndarray
+    # @rtype: numpy.ndarray
+    r = boxes.shape[1]
+    return np.repeat(np.repeat(boxes, r, axis=1), r, axis=2)
+
+
+def _candidates(grids):
+    # Return (N, n, n, n) array which is True at [k, i, j, v] iff cell
+    # (i, j) of grid k is empty and value v + 1 is not used in its row,
+    # column or subsquare.
+    #
+    # @type grids: numpy.ndarray
+    # @rtype: numpy.ndarray
+    rows, columns, boxes = _unit_counts(_one_hot(grids))
+    used = ((rows > 0)[:, :, None, :] | (columns > 0)[:, None, :, :] |
+            _spread_boxes(boxes > 0))
+    return (grids == 0)[..., None] & ~used
+
+
+def batch_is_solved(grids):
+    """
+    Return a boolean array telling which grids are solved, as
+    SudokuPuzzle.is_solved does for a single puzzle.
+
+    @type grids: numpy.ndarray
+    @rtype: numpy.ndarray
+
+    >>> grid = ["A", "B", "C", "D"]
+    >>> grid += ["C", "D", "A", "B"]
+    >>> grid += ["B", "A", "D", "C"]
+    >>> grid += ["D", "C", "B", "A"]
+    >>> s1 = SudokuPuzzle(4, grid, {"A", "B", "C", "D"})
+    >>> grid = grid[:9] + ["D", "A"] + grid[11:]
+    >>> s2 = SudokuPuzzle(4, grid, {"A", "B", "C", "D"})
+    >>> batch_is_solved(load_batch([s1, s2])[0]).tolist()
+    [True, False]
+    """
+    rows, columns, boxes = _unit_counts(_one_hot(grids))
+    return ((grids != 0).all(axis=(1, 2)) &
+            (rows == 1).all(axis=(1, 2)) &
+            (columns == 1).all(axis=(1, 2)) &
+            (boxes == 1).all(axis=(1, 2, 3)))
+
+
+def batch_fail_fast(grids):
+    """
+    Return a boolean array telling which grids have an empty cell
+    with no symbol available, as SudokuPuzzle.fail_fast does for a
+    single puzzle.
+
+    @type grids: numpy.ndarray
+    @rtype: numpy.ndarray
+
+    >>> grid = ["A", "B", "C", "D"]
+    >>> grid += ["D", "C", "B", "A"]
+    >>> grid += ["*", "D", "*", "*"]
+    >>> grid += ["B", "*", "C", "*"]
+    >>> s1 = SudokuPuzzle(4, grid, {"A", "B", "C", "D"})
+    >>> grid = grid[:8] + ["C", "D", "*", "*", "*", "*", "*", "*"]
+    >>> s2 = SudokuPuzzle(4, grid, {"A", "B", "C", "D"})
+    >>> batch_fail_fast(load_batch([s1, s2])[0]).tolist()
+    [True, False]
+    """
+    stuck = (grids == 0) & ~_candidates(grids).any(axis=3)
+    return stuck.any(axis=(1, 2))
+
+
+def _conflicts(grids):
+    # Return a boolean array telling which grids use some symbol twice
+    # in a row, column or subsquare.
+    #
+    # @type grids: numpy.ndarray
+    # @rtype: numpy.ndarray
+    rows, columns, boxes = _unit_counts(_one_hot(grids))
+    return ((rows > 1).any(axis=(1, 2)) | (columns > 1).any(axis=(1, 2)) |
+            (boxes > 1).any(axis=(1, 2, 3)))
+
+
+def batch_eliminate(grids):
+    """
+    Return a copy of grids with every cell filled in that repeated
+    candidate elimination forces: cells with a single candidate, and
+    symbols with a single possible cell in some row, column or
+    subsquare.
+
+    Every placement is forced, so a grid that ends up with a conflict
+    had no solution to begin with.
+
+    @type grids: numpy.ndarray
+    @rtype: numpy.ndarray
+
+    >>> grid = ["A", "*", "C", "D"]
+    >>> grid += ["C", "D", "*", "B"]
+    >>> grid += ["*", "A", "D", "C"]
+    >>> grid += ["D", "C", "B", "*"]
+    >>> s = SudokuPuzzle(4, grid, {"A", "B", "C", "D"})
+    >>> grids = batch_eliminate(load_batch([s])[0])
+    >>> batch_is_solved(grids).tolist()
+    [True]
+    """
+    grids = grids.copy()
+    while True:
+        candidates = _candidates(grids)
+        # naked singles: only one symbol fits in the cell
+        single = candidates.sum(axis=3) == 1
+        # hidden singles: the symbol fits in only one cell of a unit
+        rows, columns, boxes = _unit_counts(candidates)
+        hidden = candidates & ((rows == 1)[:, :, None, :] |
+                               (columns == 1)[:, None, :, :] |
+                               _spread_boxes(boxes == 1))
+        forced = np.where(single[..., None], candidates, hidden)
+        fill = forced.any(axis=3)
+        if not fill.any():
+            return grids
+        values = (forced.argmax(axis=3) + 1).astype(grids.dtype)
+        # each pass fills at least one cell, so this loop ends
+        grids[fill] = values[fill]
+
+
+def batch_solve(puzzles, solver=depth_first_solve):
+    """
+    Return the solved SudokuPuzzle for each puzzle in puzzles, or None
+    for those that cannot be solved.
+
+    The whole batch is propagated with batch_eliminate first; only the
+    puzzles that propagation leaves open are passed to solver one at a
+    time.
+
+    @type puzzles: list[SudokuPuzzle]
+    @type solver: (SudokuPuzzle) -> PuzzleNode | None
+    @rtype: list[SudokuPuzzle | None]
+
+    >>> grid = ["A", "*", "C", "D"]
+    >>> grid += ["C", "D", "*", "B"]
+    >>> grid += ["*", "A", "D", "C"]
+    >>> grid += ["D", "C", "B", "*"]
+    >>> s1 = SudokuPuzzle(4, grid, {"A", "B", "C", "D"})
+    >>> s2 = SudokuPuzzle(4, ["*"] * 16, {"A", "B", "C", "D"})
+    >>> s3 = SudokuPuzzle(4, ["A", "A"] + ["*"] * 14, {"A", "B", "C", "D"})
+    >>> solved = batch_solve([s1, s2, s3])
+    >>> [s is not None and s.is_solved() for s in solved]
+    [True, True, False]
+    """
+    grids, symbols = load_batch(puzzles)
+    grids = batch_eliminate(grids)
+    solved = batch_is_solved(grids)
+    failed = batch_fail_fast(grids) | _conflicts(grids)
+    result = []
+    for i, puzzle in enumerate(unload_batch(grids, symbols)):
+        if solved[i]:
+            result.append(puzzle)
+        elif failed[i]:
+            result.append(None)
+        else:
+            node = solver(puzzle)
+            while node is not None and node.children:
+                node = node.children[0]
+            result.append(None if node is None else node.puzzle)
+    return result
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
+    from time import time
+    s = SudokuPuzzle(9,
+                     ["*", "*", "*", "7", "*", "8", "*", "1", "*",
+                      "*", "*", "7", "*", "9", "*", "*", "*", "6",
+                      "9", "*", "3", "1", "*", "*", "*", "*", "*",
+                      "3", "5", "*", "8", "*", "*", "6", "*", "1",
+                      "*", "*", "*", "*", "*", "*", "*", "*", "*",
+                      "1", "*", "6", "*", "*", "9", "*", "4", "8",
+                      "*", "*", "*", "*", "*", "1", "2", "*", "7",
+                      "8", "*", "*", "*", "7", "*", "4", "*", "*",
+                      "*", "6", "*", "3", "*", "2", "*", "*", "*"],
+                     {"1", "2", "3", "4", "5", "6", "7", "8", "9"})
+    start = time()
+    solved = batch_solve([s] * 100)
+    end = time()
+    print("solved a batch of 100 9x9 sudokus in {} seconds\n".format(
+        end - start))
+    print(solved[0])
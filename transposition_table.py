@@ -0,0 +1,219 @@
+"""
+A transposition table in shared memory for multi-process searches.
+
+A TranspositionTable is a fixed-size open-addressing hash table of
+puzzle state keys (see Puzzle.state_key) and the depths they were
+reached at, kept in a multiprocessing.shared_memory block that every
+process of a search maps.  Processes probe and insert without locks:
+each slot holds (hash ^ data, data), so a slot caught half-written by
+another process fails the check and just reads as a miss.  Each key
+may only sit in the WINDOW slots following its home slot; when they
+are all taken, the entry reached at the greatest depth is evicted for
+a shallower one.
+
+Layout, all u64: capacity, then probe, hit, store and eviction counters
+for each of COUNTERS processes, then capacity slots of two words.
+"""
+import hashlib
+from multiprocessing import shared_memory
+
+# slots a key may occupy, starting at its home slot
+WINDOW = 4
+# processes with their own set of counters
+COUNTERS = 64
+# counters per process: probes, hits, stores, evictions
+_FIELDS = 4
+
+
+def _hash(key):
+    # Return a nonzero 64-bit hash of key.
+    #
+    # @type key: bytes | str
+    # @rtype: int
+    if isinstance(key, str):
+        key = key.encode()
+    digest = hashlib.blake2b(key, digest_size=8).digest()
+    return int.from_bytes(digest, "little") | 1
+
+
+class TranspositionTable:
+    """
+    A shared fixed-size table of state keys and their depths.
+
+    counter is the set of statistics counters this process updates,
+    0..COUNTERS - 1; processes sharing a table should use different
+    ones.
+    """
+
+    def __init__(self, capacity=1 << 20, name=None, counter=0):
+        """
+        Create a new TranspositionTable self with room for capacity
+        keys in a new shared memory block, or attach to the table in
+        the existing block called name.
+
+        @type self: TranspositionTable
+        @type capacity: int
+        @type name: str | None
+        @type counter: int
+        @rtype: None
+        """
+        assert 0 <= counter < COUNTERS
+        words = 1 + COUNTERS * _FIELDS + 2 * capacity
+        if name is None:
+            self._shm = shared_memory.SharedMemory(create=True,
+                                                   size=8 * words)
+            self._owner = True
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            self._owner = False
+        self._words = self._shm.buf.cast("Q")
+        if name is None:
+            self._words[0] = capacity
+        self.capacity = self._words[0]
+        self.counter = counter
+        self._slots = 1 + COUNTERS * _FIELDS
+
+    @property
+    def name(self):
+        """
+        Return the name of the shared memory block of self.
+
+        @type self: TranspositionTable
+        @rtype: str
+        """
+        return self._shm.name
+
+    def __reduce__(self):
+        # pickled tables attach to the same block in the new process
+        return TranspositionTable, (self.capacity, self.name, self.counter)
+
+    def close(self):
+        """
+        Detach this process from TranspositionTable self, and free its
+        block if this process created it.
+
+        @type self: TranspositionTable
+        @rtype: None
+        """
+        self._words.release()
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+    def _count(self, field):
+        # Add one to counter field of this process.
+        #
+        # @type field: int
+        # @rtype: None
+        self._words[1 + self.counter * _FIELDS + field] += 1
+
+    def _find(self, h):
+        # Return the slot holding hash h, or the free slot or evictable
+        # slot (the deepest one) where it would go, together with
+        # whether h is there.
+        #
+        # @type h: int
+        # @rtype: (int, bool)
+        words, home = self._words, h % self.capacity
+        victim, deepest = None, -1
+        for k in range(WINDOW):
+            i = self._slots + 2 * ((home + k) % self.capacity)
+            check, data = words[i], words[i + 1]
+            if data == 0:
+                # keys are never removed, so h is not past a free slot
+                return i, False
+            if check ^ data == h:
+                return i, True
+            if data > deepest:
+                victim, deepest = i, data
+        return victim, False
+
+    def _write(self, i, h, depth):
+        # Store hash h with depth in the slot at word i.
+        #
+        # @type i: int
+        # @type h: int
+        # @type depth: int
+        # @rtype: None
+        # depths are stored plus one, so 0 marks a free slot
+        self._words[i + 1] = depth + 1
+        self._words[i] = h ^ (depth + 1)
+        self._count(2)
+
+    def lookup(self, key):
+        """
+        Return the depth stored for state key key, or None if key is
+        not in TranspositionTable self.
+
+        @type self: TranspositionTable
+        @type key: bytes | str
+        @rtype: int | None
+        """
+        i, found = self._find(_hash(key))
+        return self._words[i + 1] - 1 if found else None
+
+    def visit(self, key, depth):
+        """
+        Return whether state key key was already reached at depth or
+        less, and record it at depth if not.
+
+        @type self: TranspositionTable
+        @type key: bytes | str
+        @type depth: int
+        @rtype: bool
+
+        >>> table = TranspositionTable(16)
+        >>> table.visit(b"same", 3), table.visit(b"same", 5)
+        (False, True)
+        >>> table.visit(b"same", 1), table.lookup(b"same")
+        (False, 1)
+        >>> table.lookup(b"came") is None
+        True
+        >>> table.statistics()["hits"]
+        1
+        >>> table.close()
+        """
+        h = _hash(key)
+        self._count(0)
+        i, found = self._find(h)
+        data = self._words[i + 1]
+        if found and data <= depth + 1:
+            self._count(1)
+            return True
+        if found or data == 0:
+            self._write(i, h, depth)
+        elif data > depth + 1:
+            # replace by depth: keep the shallower entry
+            self._count(3)
+            self._write(i, h, depth)
+        return False
+
+    def statistics(self):
+        """
+        Return the probe, hit, store and eviction counts of every
+        process using TranspositionTable self together, and the hit
+        rate.
+
+        @type self: TranspositionTable
+        @rtype: dict[str, int | float]
+
+        >>> table = TranspositionTable(2)
+        >>> for word in ["a", "b", "c", "b", "a"]:
+        ...     _ = table.visit(word, len(word))
+        >>> table.statistics()
+        {'probes': 5, 'hits': 2, 'stores': 2, 'evictions': 0, 'hit_rate': 0.4}
+        >>> table.close()
+        """
+        totals = [0] * _FIELDS
+        for c in range(COUNTERS):
+            for f in range(_FIELDS):
+                totals[f] += self._words[1 + c * _FIELDS + f]
+        probes, hits, stores, evictions = totals
+        return {"probes": probes, "hits": hits, "stores": stores,
+                "evictions": evictions,
+                "hit_rate": hits / probes if probes else 0.0}
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
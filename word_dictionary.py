@@ -0,0 +1,384 @@
+"""
+Compiled word-ladder dictionaries.
+
+compile_dictionary turns a word list into a binary file that
+CompiledDictionary memory-maps, so a process can start answering
+word-ladder queries without reading and hashing the plain word list.
+A CompiledDictionary can be passed as the ws argument of
+WordLadderPuzzle.
+
+File layout, all integers little-endian:
+    header      magic b"WLAD", version (u16), number of groups (u16)
+    groups      per word length, sorted by length: length (u32),
+                word count (u32), and offsets (u64) of its words,
+                neighbour starts, neighbour lists and labels
+    words       the group's words, sorted, length bytes each
+    starts      word count + 1 u32 positions into the neighbour list
+    neighbours  u32 indices (within the group) of each word's
+                neighbours, i.e. the words differing in one letter
+    labels      u32 label of each word's connected component in the
+                graph of neighbours, unique across groups
+
+Only words of the lowercase letters a-z are compiled, the letters
+WordLadderPuzzle moves through, so a puzzle finds the same ladders
+with a compiled dictionary as with the set of words it was made from.
+"""
+import mmap
+import struct
+import sys
+from collections import deque
+from collections.abc import Mapping, Set
+
+MAGIC = b"WLAD"
+VERSION = 2
+_HEADER = struct.Struct("<4sHH")
+_GROUP = struct.Struct("<IIQQQQ")
+_INDEX = struct.Struct("<I")
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def compile_dictionary(words, path):
+    """
+    Write the words in words made only of the letters in LETTERS to
+    file path in compiled form, and return how many other words were
+    skipped.
+
+    @type words: Iterable[str]
+    @type path: str
+    @rtype: int
+
+    >>> import os, tempfile
+    >>> from word_ladder_puzzle import _neighbours
+    >>> words = {"same", "Same", "came", "café", "cafe", "case", "cast"}
+    >>> path = os.path.join(tempfile.mkdtemp(), "words.bin")
+    >>> compile_dictionary(words, path)
+    2
+    >>> ws = load_dictionary(path)
+    >>> all([sorted(_neighbours(w, ws)) == sorted(_neighbours(w, words))
+    ...      for w in words])
+    True
+    >>> ws.close()
+    """
+    groups, skipped = {}, 0
+    for word in set(words):
+        if all([c in LETTERS for c in word]):
+            groups.setdefault(len(word), []).append(word.encode("ascii"))
+        else:
+            skipped += 1
+    lengths = sorted(groups)
+    # words block, starts, neighbours, labels for every group, in order
+    blocks, label_count = [], 0
+    for length in lengths:
+        group = sorted(groups[length])
+        index = {w: i for i, w in enumerate(group)}
+        # words sharing all letters but the one at position i are
+        # neighbours: bucket them by the word with position i cut out
+        neighbours = [[] for _ in group]
+        for i in range(length):
+            buckets = {}
+            for w in group:
+                buckets.setdefault(w[:i] + w[i + 1:], []).append(index[w])
+            for bucket in buckets.values():
+                for a in bucket:
+                    neighbours[a].extend([b for b in bucket if b != a])
+        starts = [0]
+        for n in neighbours:
+            n.sort()
+            starts.append(starts[-1] + len(n))
+        # breadth-first search from each unlabelled word labels its
+        # connected component
+        labels = [None] * len(group)
+        for a in range(len(group)):
+            if labels[a] is None:
+                labels[a] = label_count
+                queue = deque([a])
+                while queue:
+                    for b in neighbours[queue.popleft()]:
+                        if labels[b] is None:
+                            labels[b] = label_count
+                            queue.append(b)
+                label_count += 1
+        blocks.append((length, len(group), b"".join(group),
+                       struct.pack("<{}I".format(len(starts)), *starts),
+                       struct.pack("<{}I".format(starts[-1]),
+                                   *[b for n in neighbours for b in n]),
+                       struct.pack("<{}I".format(len(labels)), *labels)))
+    offset = _HEADER.size + _GROUP.size * len(blocks)
+    table, data = [], []
+    for length, count, *group_blocks in blocks:
+        ends = [offset]
+        for block in group_blocks:
+            ends.append(ends[-1] + len(block))
+        table.append(_GROUP.pack(length, count, *ends[:-1]))
+        data += group_blocks
+        offset = ends[-1]
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(blocks)))
+        f.write(b"".join(table))
+        for block in data:
+            f.write(block)
+    return skipped
+
+
+class CompiledDictionary(Set):
+    """
+    A read-only set of words backed by a memory-mapped file written by
+    compile_dictionary.
+
+    Every word has an id: its position when the words are listed by
+    length and then alphabetically.
+    """
+
+    def __init__(self, path):
+        """
+        Create a new CompiledDictionary self from file path.
+
+        @type self: CompiledDictionary
+        @type path: str
+        @rtype: None
+        """
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0,
+                              access=mmap.ACCESS_READ)
+        magic, version, count = _HEADER.unpack_from(self._map, 0)
+        assert magic == MAGIC and version == VERSION
+        # length -> (first id, word count, words, starts, neighbours,
+        #            labels)
+        self._groups, self._len = {}, 0
+        for g in range(count):
+            length, size, *offsets = _GROUP.unpack_from(
+                self._map, _HEADER.size + g * _GROUP.size)
+            self._groups[length] = (self._len, size, *offsets)
+            self._len += size
+
+    def close(self):
+        """
+        Release the file behind CompiledDictionary self.
+
+        @type self: CompiledDictionary
+        @rtype: None
+        """
+        self._map.close()
+        self._file.close()
+
+    def __len__(self):
+        """
+        Return the number of words in CompiledDictionary self.
+
+        @type self: CompiledDictionary
+        @rtype: int
+        """
+        return self._len
+
+    def __iter__(self):
+        """
+        Yield the words of CompiledDictionary self in id order.
+
+        @type self: CompiledDictionary
+        @rtype: Iterator[str]
+        """
+        for length in sorted(self._groups):
+            for i in range(self._groups[length][1]):
+                yield self._word_at(length, i)
+
+    def __contains__(self, word):
+        """
+        Return whether word is in CompiledDictionary self.
+
+        @type self: CompiledDictionary
+        @type word: str
+        @rtype: bool
+        """
+        return self.word_id(word) is not None
+
+    def __eq__(self, other):
+        """
+        Return whether CompiledDictionary self holds the same words as
+        other.
+
+        @type self: CompiledDictionary
+        @type other: Any
+        @rtype: bool
+        """
+        return other is self or Set.__eq__(self, other)
+
+    def _word_at(self, length, i):
+        # Return the i-th word of length length.
+        #
+        # @type length: int
+        # @type i: int
+        # @rtype: str
+        words = self._groups[length][2]
+        start = words + i * length
+        return self._map[start:start + length].decode("ascii")
+
+    def word_id(self, word):
+        """
+        Return the id of word in CompiledDictionary self, or None if
+        word is not in self.
+
+        @type self: CompiledDictionary
+        @type word: str
+        @rtype: int | None
+        """
+        if not isinstance(word, str) or len(word) not in self._groups:
+            return None
+        try:
+            key = word.encode("ascii")
+        except UnicodeEncodeError:
+            return None
+        length = len(key)
+        first, size, words = self._groups[length][:3]
+        # binary search over the sorted fixed-width words
+        low, high = 0, size
+        while low < high:
+            mid = (low + high) // 2
+            start = words + mid * length
+            found = self._map[start:start + length]
+            if found < key:
+                low = mid + 1
+            elif found > key:
+                high = mid
+            else:
+                return first + mid
+        return None
+
+    def word(self, word_id):
+        """
+        Return the word with id word_id in CompiledDictionary self.
+
+        @type self: CompiledDictionary
+        @type word_id: int
+        @rtype: str
+        """
+        assert 0 <= word_id < self._len
+        for length, group in self._groups.items():
+            if group[0] <= word_id < group[0] + group[1]:
+                return self._word_at(length, word_id - group[0])
+
+    def neighbours(self, word):
+        """
+        Return the sorted list of words in CompiledDictionary self that
+        differ from word in exactly one letter.
+
+        @type self: CompiledDictionary
+        @type word: str
+        @rtype: list[str]
+        """
+        word_id = self.word_id(word)
+        if word_id is None:
+            # not a compiled word: try every one-letter change
+            result = set()
+            for i in range(len(word)):
+                for letter in LETTERS:
+                    next_word = word[:i] + letter + word[i + 1:]
+                    if next_word != word and next_word in self:
+                        result.add(next_word)
+            return sorted(result)
+        length = len(word)
+        first, size, words, starts, neighbours = self._groups[length][:5]
+        i = word_id - first
+        begin = _INDEX.unpack_from(self._map, starts + 4 * i)[0]
+        end = _INDEX.unpack_from(self._map, starts + 4 * (i + 1))[0]
+        return [self._word_at(length, _INDEX.unpack_from(
+                    self._map, neighbours + 4 * k)[0])
+                for k in range(begin, end)]
+
+    def component_label(self, word):
+        """
+        Return the label of the connected component of word in
+        CompiledDictionary self, or None if word is not in self.  Two
+        words are joined by a ladder through self exactly when their
+        labels are equal.
+
+        @type self: CompiledDictionary
+        @type word: str
+        @rtype: int | None
+        """
+        word_id = self.word_id(word)
+        if word_id is None:
+            return None
+        group = self._groups[len(word)]
+        return _INDEX.unpack_from(self._map,
+                                  group[5] + 4 * (word_id - group[0]))[0]
+
+    def component_labels(self):
+        """
+        Return a read-only mapping from each word of CompiledDictionary
+        self to its component label, read from the file on lookup.
+
+        @type self: CompiledDictionary
+        @rtype: Mapping[str, int]
+        """
+        return _ComponentLabels(self)
+
+
+class _ComponentLabels(Mapping):
+    # The component labels of a CompiledDictionary, looked up in its
+    # file rather than held in a dict.
+
+    def __init__(self, dictionary):
+        # @type dictionary: CompiledDictionary
+        # @rtype: None
+        self._dictionary = dictionary
+
+    def __getitem__(self, word):
+        # @type word: str
+        # @rtype: int
+        label = self._dictionary.component_label(word)
+        if label is None:
+            raise KeyError(word)
+        return label
+
+    def __iter__(self):
+        # @rtype: Iterator[str]
+        return iter(self._dictionary)
+
+    def __len__(self):
+        # @rtype: int
+        return len(self._dictionary)
+
+
+def load_dictionary(path):
+    """
+    Return the CompiledDictionary in file path.
+
+    @type path: str
+    @rtype: CompiledDictionary
+
+    >>> import os, tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), "words.bin")
+    >>> compile_dictionary(["same", "came", "cost", "cast", "case", "a"],
+    ...                    path)
+    0
+    >>> ws = load_dictionary(path)
+    >>> len(ws), "case" in ws, "cave" in ws
+    (6, True, False)
+    >>> ws.neighbours("case"), ws.neighbours("cave")
+    (['came', 'cast'], ['came', 'case'])
+    >>> ws.word(ws.word_id("cost"))
+    'cost'
+    >>> ws.component_label("cost") == ws.component_label("same")
+    True
+    >>> ws.component_label("a") == ws.component_label("same")
+    False
+    >>> ws.component_label("cave") is None
+    True
+    >>> from word_ladder_puzzle import LadderTreeCache, WordLadderPuzzle
+    >>> sol = LadderTreeCache().solve(WordLadderPuzzle("same", "cost", ws))
+    >>> sol.children[0].puzzle == WordLadderPuzzle("came", "cost", ws)
+    True
+    >>> ws.close()
+    """
+    return CompiledDictionary(path)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
+    # usage: python word_dictionary.py WORDS COMPILED
+    if len(sys.argv) == 3:
+        from puzzle_io import read_words
+        skipped = compile_dictionary(read_words(sys.argv[1]), sys.argv[2])
+        if skipped:
+            print("skipped {} words not made of a-z".format(skipped))
@@ -1,4 +1,13 @@
 from puzzle import Puzzle
+from puzzle_tools import path_to_node
+from collections import OrderedDict, deque
+
+# letters used for 1-character changes
+_CHARS = "abcdefghijklmnopqrstuvwxyz"
+# number of dictionaries whose component labels are kept
+_COMPONENT_CACHE_SIZE = 8
+# id(ws) -> (ws, len(ws), labels) for recently used dictionaries ws
+_components = OrderedDict()
 
 
 class WordLadderPuzzle(Puzzle):
@@ -20,7 +29,7 @@ class WordLadderPuzzle(Puzzle):
         (self._from_word, self._to_word, self._word_set) = (from_word,
                                                             to_word, ws)
         # set of characters to use for 1-character changes
-        self._chars = "abcdefghijklmnopqrstuvwxyz"
+        self._chars = _CHARS
 
         # implement __eq__ and __str__
         # __repr__ is up to you
@@ -79,20 +88,9 @@ class WordLadderPuzzle(Puzzle):
         WordLadderPuzzle("came", "cost", {"some", "came", "lame"}), \
         WordLadderPuzzle("lame", "cost", {"some", "came", "lame"})]
         """
-        result = []
-        for i in range(len(self._from_word)):
-            for letter in self._chars:
-                # find a letter in alphabet that is not a given _to_word
-                if letter != self._from_word[i]:
-                    # construct a word using new letter
-                    next_word = self._from_word[:i] + letter + \
-                        self._from_word[i+1:]
-                    # if this word is in set of words put it into the list
-                    if next_word in self._word_set:
-                        next1 = WordLadderPuzzle(next_word, self._to_word,
-                                                 self._word_set)
-                        result += [next1]
-        return result
+        return [WordLadderPuzzle(next_word, self._to_word, self._word_set)
+                for next_word in _neighbours(self._from_word,
+                                             self._word_set)]
 
         # override is_solved
         # this WordLadderPuzzle is solved when _from_word is the same as
@@ -112,15 +110,310 @@ class WordLadderPuzzle(Puzzle):
         """
         return self._from_word == self._to_word
 
+    def heuristic(self):
+        """
+        Return the number of positions where _from_word and _to_word
+        differ.
+
+        @type self: WordLadderPuzzle
+        @rtype: int
+
+        >>> WordLadderPuzzle("case", "cost", {"cost"}).heuristic()
+        2
+        """
+        return (sum([a != b for a, b in zip(self._from_word, self._to_word)])
+                + abs(len(self._from_word) - len(self._to_word)))
+
+    def ordered_extensions(self):
+        """
+        Return the extensions of WordLadderPuzzle self, words sharing
+        the most letters with _to_word first.
+
+        @type self: WordLadderPuzzle
+        @rtype: list[WordLadderPuzzle]
+
+        >>> w = WordLadderPuzzle("same", "cost", {"some", "came", "lame"})
+        >>> [x._from_word for x in w.ordered_extensions()]
+        ['came', 'some', 'lame']
+        """
+        return sorted(self.extensions(), key=lambda x: x.heuristic())
+
+    def state_key(self):
+        """
+        Return a bytes key for self: _from_word in UTF-32, four bytes
+        per letter so that any start word, ASCII or not, has a key.
+
+        @type self: WordLadderPuzzle
+        @rtype: bytes
+
+        >>> w = WordLadderPuzzle("same", "cost", {"some", "came", "lame"})
+        >>> w.state_key() == "same".encode("utf-32-le")
+        True
+        >>> w.from_state_key("came".encode("utf-32-le")) == \\
+        ...     WordLadderPuzzle("came", "cost", w._word_set)
+        True
+        >>> c = WordLadderPuzzle("café", "cafs", {"café", "cafe", "cafs"})
+        >>> c.from_state_key(c.state_key()) == c
+        True
+        """
+        return self._from_word.encode("utf-32-le")
+
+    def from_state_key(self, key):
+        """
+        Return the WordLadderPuzzle towards the same _to_word over the
+        same dictionary as self whose state_key is key.
+
+        @type self: WordLadderPuzzle
+        @type key: bytes
+        @rtype: WordLadderPuzzle
+        """
+        return WordLadderPuzzle(bytes(key).decode("utf-32-le"), self._to_word,
+                                self._word_set)
+
+    # override fail_fast
+    # a ladder can only reach _to_word from words in the same connected
+    # component of the one-letter-change graph over the dictionary
+
+    def fail_fast(self):
+        """
+        Return True if no ladder of words in the dictionary leads from
+        _from_word to _to_word and False otherwise.
+
+        @type self: WordLadderPuzzle
+        @rtype: bool
+
+        >>> ws = {"same", "came", "case", "cost", "cast", "zzzz"}
+        >>> WordLadderPuzzle("same", "cost", ws).fail_fast()
+        False
+        >>> WordLadderPuzzle("same", "zzzz", ws).fail_fast()
+        True
+        >>> WordLadderPuzzle("same", "costs", ws).fail_fast()
+        True
+        >>> WordLadderPuzzle("sane", "cost", ws).fail_fast()
+        False
+        >>> ws = {"cat", "cot"}
+        >>> WordLadderPuzzle("cat", "cot", ws).fail_fast()
+        False
+        >>> ws.add("dot")
+        >>> WordLadderPuzzle("cat", "dot", ws).fail_fast()
+        False
+        >>> WordLadderPuzzle("café", "cafs", {"cafe", "café", "cafs"}
+        ...                  ).fail_fast()
+        False
+        """
+        from_word, to_word, ws = (self._from_word, self._to_word,
+                                  self._word_set)
+        if from_word == to_word:
+            return False
+        if len(from_word) != len(to_word) or to_word not in ws:
+            return True
+        labels = component_labels(ws)
+        # a word without a label has letters outside a-z or was added
+        # to ws after it was labelled, so nothing is known about it
+        if to_word not in labels:
+            return False
+        target = labels[to_word]
+        if from_word in labels:
+            return labels[from_word] != target
+        # from_word need not be in ws or have a label: its first step
+        # has to land in the component of to_word
+        return all([labels.get(w, target) != target
+                    for w in _neighbours(from_word, ws)])
+
+
+def component_labels(ws):
+    """
+    Return a dict mapping each word of ws to the label of its connected
+    component in the graph joining words that differ in one letter.
+    Words of different lengths never share a label.  Only words made
+    of the letters a-z are labelled: a move can turn a word with other
+    letters into one of them but never back, so such words are not
+    joined both ways.
+
+    Labels are computed once per dictionary and kept for the most
+    recently used dictionaries; they are computed again when the
+    number of words in ws has changed since.  A compiled dictionary
+    (see word_dictionary) supplies them from its prebuilt labels.
+
+    @type ws: set[str]
+    @rtype: Mapping[str, int]
+
+    >>> labels = component_labels({"cat", "cot", "dot", "pin", "pit"})
+    >>> labels["cat"] == labels["dot"], labels["cat"] == labels["pin"]
+    (True, False)
+    >>> "café" in component_labels({"café", "cafe"})
+    False
+    """
+    if hasattr(ws, "component_labels"):
+        return ws.component_labels()
+    key = id(ws)
+    if key in _components and _components[key][1] == len(ws):
+        _components.move_to_end(key)
+        return _components[key][2]
+    labels = {}
+    for word in ws:
+        if word not in labels and all([c in _CHARS for c in word]):
+            label = len(labels)
+            labels[word] = label
+            queue = deque([word])
+            while queue:
+                for next_word in _neighbours(queue.popleft(), ws):
+                    if next_word not in labels:
+                        labels[next_word] = label
+                        queue.append(next_word)
+    _components[key] = (ws, len(ws), labels)
+    if len(_components) > _COMPONENT_CACHE_SIZE:
+        _components.popitem(last=False)
+    return labels
+
+
+def _neighbours(word, ws):
+    """
+    Return the list of words in ws that differ from word in exactly
+    one letter.  A compiled dictionary (see word_dictionary) supplies
+    them from its prebuilt neighbour lists.
+
+    @type word: str
+    @type ws: set[str]
+    @rtype: list[str]
+
+    >>> _neighbours("same", {"some", "came", "lame", "cost"})
+    ['came', 'lame', 'some']
+    """
+    if hasattr(ws, "neighbours"):
+        return ws.neighbours(word)
+    result = []
+    for i in range(len(word)):
+        for letter in _CHARS:
+            if letter != word[i]:
+                next_word = word[:i] + letter + word[i + 1:]
+                if next_word in ws:
+                    result.append(next_word)
+    return result
+
+
+class LadderTreeCache:
+    """
+    Reverse breadth-first search trees towards target words, kept for
+    the most recently used (dictionary, target word) pairs so that
+    repeated queries towards the same target only walk a path.
+
+    Dictionaries are identified by the set object itself, so a word set
+    must not be changed while trees built over it are cached.
+    """
+
+    def __init__(self, capacity=16):
+        """
+        Create a new LadderTreeCache self holding at most capacity
+        trees, evicting the least recently used one when full.
+
+        @type self: LadderTreeCache
+        @type capacity: int
+        @rtype: None
+        """
+        assert capacity > 0
+        self.capacity = capacity
+        # (id(ws), to_word) -> (ws, parent, distance); keeping ws in
+        # the entry stops its id from being reused while cached
+        self._trees = OrderedDict()
+
+    def __len__(self):
+        """
+        Return the number of trees cached in self.
+
+        @type self: LadderTreeCache
+        @rtype: int
+        """
+        return len(self._trees)
+
+    def tree(self, ws, to_word):
+        """
+        Return (parent, distance) for target to_word over ws: parent
+        maps each word that can reach to_word to the next word on a
+        shortest ladder (None for to_word), distance to its number of
+        steps.
+
+        @type self: LadderTreeCache
+        @type ws: set[str]
+        @type to_word: str
+        @rtype: (dict[str, str | None], dict[str, int])
+
+        >>> cache = LadderTreeCache()
+        >>> parent, distance = cache.tree({"cat", "cot", "dot"}, "dot")
+        >>> parent["cat"], distance["cat"]
+        ('cot', 2)
+        """
+        key = (id(ws), to_word)
+        if key in self._trees:
+            self._trees.move_to_end(key)
+            return self._trees[key][1:]
+        parent, distance = {to_word: None}, {to_word: 0}
+        # a ladder only steps onto words of ws, so unless to_word is in
+        # ws nothing but to_word itself can reach it
+        queue = deque([to_word] if to_word in ws else [])
+        while queue:
+            word = queue.popleft()
+            for next_word in _neighbours(word, ws):
+                if next_word not in parent:
+                    parent[next_word] = word
+                    distance[next_word] = distance[word] + 1
+                    queue.append(next_word)
+        self._trees[key] = (ws, parent, distance)
+        if len(self._trees) > self.capacity:
+            self._trees.popitem(last=False)
+        return parent, distance
+
+    def solve(self, puzzle):
+        """
+        Return a shortest path from PuzzleNode(puzzle) to a PuzzleNode
+        containing a solution, or None if there is none, using the
+        cached tree for puzzle's dictionary and target word.
+
+        @type self: LadderTreeCache
+        @type puzzle: WordLadderPuzzle
+        @rtype: PuzzleNode | None
+
+        >>> cache = LadderTreeCache()
+        >>> ws = {"same", "came", "case", "cost", "cast"}
+        >>> sol = cache.solve(WordLadderPuzzle("same", "cost", ws))
+        >>> words = []
+        >>> while sol is not None:
+        ...     words.append(sol.puzzle._from_word)
+        ...     sol = (sol.children or [None])[0]
+        >>> words
+        ['same', 'came', 'case', 'cast', 'cost']
+        >>> cache.solve(WordLadderPuzzle("same", "lame", ws)) is None
+        True
+        """
+        from_word, to_word, ws = (puzzle._from_word, puzzle._to_word,
+                                  puzzle._word_set)
+        parent, distance = self.tree(ws, to_word)
+        if from_word in parent:
+            word = from_word
+        else:
+            # from_word need not be in ws: step onto its closest
+            # neighbour in the tree
+            steps = [w for w in _neighbours(from_word, ws) if w in parent]
+            if not steps:
+                return None
+            word = min(steps, key=lambda w: distance[w])
+        path = [puzzle]
+        if word != from_word:
+            path.append(WordLadderPuzzle(word, to_word, ws))
+        while parent[word] is not None:
+            word = parent[word]
+            path.append(WordLadderPuzzle(word, to_word, ws))
+        return path_to_node(path)
+
 
 if __name__ == '__main__':
     import doctest
     doctest.testmod()
 
     from puzzle_tools import breadth_first_solve, depth_first_solve
+    from puzzle_io import read_words
     from time import time
-    with open("words", "r") as words:
-        word_set = set(words.read().split())
+    word_set = read_words("words")
     w = WordLadderPuzzle("same", "cost", word_set)
     start = time()
     sol = breadth_first_solve(w)
@@ -134,3 +427,9 @@ if __name__ == '__main__':
     print("Solving word ladder from same->cost")
     print("...using depth-first-search")
     print("Solutions: {} took {} seconds.".format(sol, end - start))
+    cache = LadderTreeCache()
+    start = time()
+    sol = cache.solve(w)
+    end = time()
+    print("...using a cached reverse breadth-first tree")
+    print("Solutions: {} took {} seconds.".format(sol, end - start))